@@ -0,0 +1,46 @@
+from rest_framework.filters import BaseFilterBackend
+
+from .serializers import OrderFilterSerializer
+from orders.models import ParameterInOrder
+
+
+class OrderFilterBackend(BaseFilterBackend):
+    """Filter orders by query parameters.
+
+    Every supported combination of filters is a prefix of one of the
+    composite indexes on ``Order`` followed by a ``time_created`` range.
+    Without ``complete`` only open orders are returned. Parameter values
+    are filtered by their typed columns, which are indexed per parameter.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        query = OrderFilterSerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+
+        queryset = queryset.filter(complete=params.get('complete', False))
+        if 'service' in params:
+            queryset = queryset.filter(service_id=params['service'])
+        if 'performer' in params:
+            queryset = queryset.filter(performer_id=params['performer'])
+        if 'created_after' in params:
+            queryset = queryset.filter(
+                time_created__gte=params['created_after'])
+        if 'created_before' in params:
+            queryset = queryset.filter(
+                time_created__lt=params['created_before'])
+        if 'parameter' in params:
+            queryset = queryset.filter(
+                id__in=self.filter_values(params).values('order_id'))
+        return queryset
+
+    def filter_values(self, params):
+        values = ParameterInOrder.objects.filter(
+            parameter__title=params['parameter'])
+        if 'value_min' in params:
+            values = values.filter(value_int__gte=params['value_min'])
+        if 'value_max' in params:
+            values = values.filter(value_int__lte=params['value_max'])
+        if params['checked'] is not None:
+            values = values.filter(value_bool=params['checked'])
+        return values
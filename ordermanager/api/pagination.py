@@ -0,0 +1,141 @@
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from orders.open_orders import OpenOrders
+
+
+class OrderCursorPagination(BasePagination):
+    """Keyset pagination of orders by the ``(time_created, id)`` pair.
+
+    The cursor holds the key of the boundary row, so every page is a range
+    scan over one of the composite ``(..., time_created, id)`` indexes and
+    deep pages cost the same as the first one. ``?ordering=-time_created``
+    walks the same index backwards. Materialized ``OpenOrders`` are paged
+    by the same key in memory.
+    """
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    cursor_query_param = 'cursor'
+    ordering_query_param = 'ordering'
+    orderings = {'time_created': False, '-time_created': True}
+    invalid_cursor_message = 'Неверный курсор.'
+    invalid_ordering_message = 'Допустимые значения: {orderings}.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        descending = self.get_descending(request)
+        cursor = self.decode_cursor(request)
+
+        if cursor is None:
+            reverse, key = False, None
+        else:
+            reverse, key = cursor
+        backwards = reverse != descending
+        if isinstance(queryset, OpenOrders):
+            results = queryset.page(key, backwards, self.page_size + 1)
+        else:
+            if key is not None:
+                queryset = queryset.filter(self.get_key_filter(key, backwards))
+            ordering = ('-time_created', '-id') if backwards else (
+                'time_created', 'id')
+            results = list(queryset.order_by(*ordering)[:self.page_size + 1])
+
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+            self.has_next, self.has_previous = key is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, key is not None
+
+        self.page = results
+        return results
+
+    def get_key_filter(self, key, backwards):
+        time_created, pk = key
+        if backwards:
+            return Q(time_created__lte=time_created) & (
+                Q(time_created__lt=time_created) | Q(id__lt=pk))
+        return Q(time_created__gte=time_created) & (
+            Q(time_created__gt=time_created) | Q(id__gt=pk))
+
+    def get_descending(self, request):
+        ordering = request.query_params.get(
+            self.ordering_query_param, 'time_created')
+        if ordering not in self.orderings:
+            message = self.invalid_ordering_message.format(
+                orderings=', '.join(self.orderings))
+            raise ValidationError({self.ordering_query_param: message})
+        return self.orderings[ordering]
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            direction, time_created, pk = b64decode(
+                encoded.encode('ascii')).decode('ascii').split('|')
+            time_created = parse_datetime(time_created)
+            pk = int(pk)
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if time_created is None or direction not in ('n', 'p'):
+            raise NotFound(self.invalid_cursor_message)
+        return direction == 'p', (time_created, pk)
+
+    def encode_cursor(self, obj, reverse):
+        direction = 'p' if reverse else 'n'
+        raw = '|'.join([direction, obj.time_created.isoformat(), str(obj.id)])
+        encoded = b64encode(raw.encode('ascii')).decode('ascii')
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
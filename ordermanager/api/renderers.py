@@ -0,0 +1,23 @@
+from rest_framework.renderers import BaseRenderer
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Render responses as MessagePack for clients that accept it."""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=str)
+
+
+# MessagePack is served only where the msgpack package is installed.
+OPTIONAL_RENDERER_CLASSES = [MessagePackRenderer] if msgpack else []
@@ -1,6 +1,9 @@
 from rest_framework import serializers
 
-from orders.models import Order, ParameterInOrder
+from orders.intake import INTAKE_BATCH_SIZE, validate_orders
+from orders.models import (
+    Order, ParameterInOrder, prefetch_missing_parameters,
+)
 
 
 class ParameterInOrderSerializer(serializers.ModelSerializer):
@@ -12,13 +15,54 @@ class ParameterInOrderSerializer(serializers.ModelSerializer):
         verbose_name = 'Параметры'
 
 
-class OrderReadSerializer(serializers.ModelSerializer):
-    parameters_assigned = ParameterInOrderSerializer(many=True)
+def get_sparse_fields(query_params, fields):
+    """Return the fields listed in ``?fields=`` and not in ``?omit=``."""
+    selected = {}
+    for param in ['fields', 'omit']:
+        names = [
+            name.strip() for name in query_params.get(param, '').split(',')
+            if name.strip()]
+        unknown = [name for name in names if name not in fields]
+        if unknown:
+            raise serializers.ValidationError(
+                {param: f'Неизвестные поля: {", ".join(unknown)}.'})
+        selected[param] = names
+    return [
+        name for name in fields
+        if (name in selected['fields'] or not selected['fields'])
+        and name not in selected['omit']]
+
+
+class SparseFieldsetMixin:
+    """Serialize only the fields requested with ``?fields=``/``?omit=``."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None:
+            return
+        fields = get_sparse_fields(request.query_params, self.Meta.fields)
+        for name in set(self.fields) - set(fields):
+            self.fields.pop(name)
+
+
+class OrderListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        orders = list(data)
+        if 'parameters_assigned' in self.child.fields:
+            prefetch_missing_parameters(orders)
+        return super().to_representation(orders)
+
+
+class OrderReadSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    parameters_assigned = ParameterInOrderSerializer(
+        many=True, source='get_parameters')
     service = serializers.CharField()
 
     class Meta:
         model = Order
         fields = ['id', 'service', 'parameters_assigned', 'complete']
+        list_serializer_class = OrderListSerializer
 
 
 class OrderWriteSerializer(serializers.ModelSerializer):
@@ -29,3 +73,99 @@ class OrderWriteSerializer(serializers.ModelSerializer):
     class Meta:
         model = Order
         fields = ['performer', 'complete']
+
+    def update(self, instance, validated_data):
+        performer = validated_data['performer']
+        if not Order.objects.mark_complete(instance.pk, performer):
+            if Order.objects.filter(pk=instance.pk, complete=False).exists():
+                raise serializers.ValidationError(
+                    'Заказ взят в работу другим сотрудником.')
+            raise serializers.ValidationError('Заказ уже выполнен.')
+        instance.complete = True
+        instance.performer = performer
+        return instance
+
+
+class OrderCounterQuerySerializer(serializers.Serializer):
+    group_by = serializers.ChoiceField(
+        choices=['service', 'performer', 'hour'], default='service')
+    service = serializers.IntegerField(required=False)
+    hour_from = serializers.DateTimeField(required=False)
+    hour_to = serializers.DateTimeField(required=False)
+
+
+class OrderSearchQuerySerializer(serializers.Serializer):
+    q = serializers.CharField(max_length=2000)
+    parameter = serializers.CharField(required=False)
+    service = serializers.IntegerField(required=False)
+
+
+class OrderFilterSerializer(serializers.Serializer):
+    complete = serializers.BooleanField(required=False)
+    service = serializers.IntegerField(required=False)
+    performer = serializers.IntegerField(required=False)
+    created_after = serializers.DateTimeField(required=False)
+    created_before = serializers.DateTimeField(required=False)
+    parameter = serializers.CharField(required=False)
+    value_min = serializers.IntegerField(required=False)
+    value_max = serializers.IntegerField(required=False)
+    checked = serializers.BooleanField(allow_null=True, default=None)
+
+    def validate(self, data):
+        if 'parameter' not in data and (
+                'value_min' in data or 'value_max' in data
+                or data.get('checked') is not None):
+            raise serializers.ValidationError(
+                {'parameter': 'Укажите параметр для фильтра по значению.'})
+        return data
+
+
+class OrderBulkCompleteSerializer(serializers.Serializer):
+    LIMIT = 1000
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(), required=False, allow_empty=False,
+        max_length=LIMIT)
+    service = serializers.IntegerField(required=False)
+    created_after = serializers.DateTimeField(required=False)
+    created_before = serializers.DateTimeField(required=False)
+
+    def validate(self, data):
+        if not data:
+            raise serializers.ValidationError(
+                'Укажите номера заказов или фильтр.')
+        return data
+
+
+class OrderBatchParameterSerializer(serializers.Serializer):
+    parameter = serializers.CharField()
+    value = serializers.CharField(max_length=2000, allow_blank=True)
+
+
+class OrderBatchItemSerializer(serializers.Serializer):
+    service = serializers.IntegerField()
+    parameters = OrderBatchParameterSerializer(many=True)
+
+
+class OrderBatchSerializer(serializers.Serializer):
+    orders = OrderBatchItemSerializer(many=True, allow_empty=False)
+
+    def validate_orders(self, orders):
+        if len(orders) > INTAKE_BATCH_SIZE:
+            raise serializers.ValidationError(
+                f'Не более {INTAKE_BATCH_SIZE} заказов за один запрос.')
+        items = [
+            {
+                'service': order['service'],
+                'parameters': [
+                    (item['parameter'], item['value'])
+                    for item in order['parameters']],
+            }
+            for order in orders
+        ]
+        errors = validate_orders(items)
+        if any(errors):
+            raise serializers.ValidationError(
+                [{'non_field_errors': item} if item else {}
+                 for item in errors])
+        return items
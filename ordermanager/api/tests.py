@@ -0,0 +1,790 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.shortcuts import reverse
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from api.filters import OrderFilterBackend
+from api.pagination import OrderCursorPagination
+from api.renderers import msgpack
+from api.serializers import OrderBulkCompleteSerializer
+from orders.models import (
+    ArchivedOrder, Order, OrderCounter, Parameter, ParameterInOrder,
+    ParameterInService, Service,
+)
+from orders.open_orders import OPEN_ORDERS_KEY, OPEN_ORDERS_SEQUENCE_KEY
+
+User = get_user_model()
+
+
+class ApiBaseSetUp(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='someuser', is_staff=True)
+        self.client.force_authenticate(self.user)
+        self.service = Service.objects.create(title='Услуга')
+
+
+class OrderPaginationTest(ApiBaseSetUp):
+    def setUp(self):
+        super().setUp()
+        self.orders = Order.objects.bulk_create(
+            Order(service=self.service) for _ in range(25))
+        self.url = reverse('api:orders-list')
+
+    def collect_ids(self, url):
+        ids = []
+        while url is not None:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        return ids
+
+    def test_pages_cover_open_orders_in_order(self):
+        expected = list(
+            Order.objects.order_by('time_created', 'id').values_list(
+                'id', flat=True))
+        self.assertEqual(self.collect_ids(f'{self.url}?page_size=7'), expected)
+
+    def test_previous_link(self):
+        first = self.client.get(f'{self.url}?page_size=10').data
+        self.assertIsNone(first['previous'])
+        second = self.client.get(first['next']).data
+        previous = self.client.get(second['previous']).data
+        self.assertEqual(previous['results'], first['results'])
+
+    def test_page_size_is_capped(self):
+        with mock.patch.object(OrderCursorPagination, 'max_page_size', 5):
+            response = self.client.get(f'{self.url}?page_size=100000')
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(f'{self.url}?cursor=garbage')
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(ORDER_LIST_MODE='materialized')
+class MaterializedOrderPaginationTest(OrderPaginationTest):
+    def setUp(self):
+        cache.delete_many([OPEN_ORDERS_KEY, OPEN_ORDERS_SEQUENCE_KEY])
+        super().setUp()
+
+    def test_page_loaded_by_primary_key(self):
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url, {'page_size': 5})
+        self.assertEqual(len(response.data['results']), 5)
+        # The page of orders by primary key and parameters of orders
+        # without a snapshot.
+        self.assertEqual(len(context.captured_queries), 2)
+        self.assertIn('"id" IN (', context.captured_queries[0]['sql'])
+
+    def test_completed_order_left_out(self):
+        self.client.get(self.url)
+        completed = Order.objects.order_by('id').first()
+        Order.objects.filter(id=completed.id).update(complete=True)
+        ids = self.collect_ids(self.url)
+        self.assertNotIn(completed.id, ids)
+        self.assertEqual(len(ids), 24)
+
+    def test_filtered_list_read_from_database(self):
+        self.client.get(self.url)
+        order = Order.objects.create(
+            service=Service.objects.create(title='Другая услуга'))
+        response = self.client.get(self.url, {'service': order.service_id})
+        self.assertEqual(
+            [item['id'] for item in response.data['results']], [order.id])
+
+
+class OrderQueryCountTest(ApiBaseSetUp):
+    def create_orders(self, quantity):
+        parameters = [
+            Parameter.objects.create(title=f'Параметр {q}') for q in range(3)]
+        orders = Order.objects.bulk_create(
+            Order(service=self.service) for _ in range(quantity))
+        if orders[0].id is None:
+            orders = list(Order.objects.all())
+        ParameterInOrder.objects.bulk_create(
+            ParameterInOrder(order=order, parameter=parameter, value='1')
+            for order in orders for parameter in parameters)
+
+    def count_queries(self, quantity):
+        self.create_orders(quantity)
+        url = f"{reverse('api:orders-list')}?page_size=1000"
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(len(response.data['results']), quantity)
+        return len(context.captured_queries)
+
+    def test_list_query_count_is_constant(self):
+        few = self.count_queries(10)
+        Order.objects.all().delete()
+        Parameter.objects.all().delete()
+        many = self.count_queries(1000)
+        self.assertEqual(few, many)
+
+    def test_retrieve_query_count(self):
+        self.create_orders(1)
+        order = Order.objects.get()
+        url = reverse('api:orders-detail', kwargs={'pk': order.id})
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data['parameters_assigned']), 3)
+
+
+class OrderSparseFieldsetTest(ApiBaseSetUp):
+    def setUp(self):
+        super().setUp()
+        self.orders = [
+            Order.objects.create(
+                service=self.service,
+                parameters_snapshot=[{'parameter': 'Адрес', 'value': 'Дом'}])
+            for _ in range(3)]
+        self.url = reverse('api:orders-list')
+
+    def test_fields(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url, {'fields': 'id,complete'})
+        self.assertEqual(
+            dict(response.data['results'][0]),
+            {'id': self.orders[0].id, 'complete': False})
+        for query in context.captured_queries:
+            self.assertNotIn('parameters_snapshot', query['sql'])
+            self.assertNotIn('orders_service', query['sql'])
+
+    def test_omit(self):
+        response = self.client.get(
+            reverse('api:orders-detail', kwargs={'pk': self.orders[0].id}),
+            {'omit': 'parameters_assigned'})
+        self.assertEqual(
+            set(response.data), {'id', 'service', 'complete'})
+
+    def test_unknown_fields(self):
+        for params in [{'fields': 'id,author'}, {'omit': 'secret'}]:
+            with self.subTest(params=params):
+                response = self.client.get(self.url, params)
+                self.assertEqual(response.status_code, 400)
+
+    @skipUnless(msgpack, 'msgpack is not installed')
+    def test_msgpack(self):
+        response = self.client.get(
+            self.url, {'fields': 'id'}, HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        data = msgpack.unpackb(response.content)
+        self.assertEqual(
+            data['results'], [{'id': order.id} for order in self.orders])
+        json_etag = self.client.get(self.url, {'fields': 'id'})['ETag']
+        self.assertNotEqual(response['ETag'], json_etag)
+
+
+class OrderConditionalGetTest(ApiBaseSetUp):
+    def setUp(self):
+        super().setUp()
+        self.order = Order.objects.create(service=self.service)
+        self.detail_url = reverse(
+            'api:orders-detail', kwargs={'pk': self.order.id})
+
+    def test_retrieve_not_modified(self):
+        response = self.client.get(self.detail_url)
+        etag = response['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.client.put(self.detail_url)
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_retrieve_missing_order(self):
+        for pk in [self.order.id + 1, 'abc']:
+            with self.subTest(pk=pk):
+                response = self.client.get(f'/api/v1/orders/{pk}/')
+                self.assertEqual(response.status_code, 404)
+
+    def test_list_not_modified(self):
+        url = reverse('api:orders-list')
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(
+            url, {'complete': 'true'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        Order.objects.create(service=self.service)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_modified_when_service_renamed(self):
+        url = reverse('api:orders-list')
+        etags = [self.client.get(url)['ETag'], self.client.get(
+            self.detail_url)['ETag']]
+        self.service.title = 'Новое название'
+        self.service.save()
+        for url, etag in zip([url, self.detail_url], etags):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'Новое название')
+
+
+class OrderWorkQueueTest(ApiBaseSetUp):
+    def setUp(self):
+        super().setUp()
+        self.another_user = User.objects.create(
+            username='anotheruser', is_staff=True)
+        self.orders = [
+            Order.objects.create(service=self.service) for _ in range(2)]
+        self.claim_url = reverse('api:orders-claim')
+
+    def test_claims_oldest_orders_once(self):
+        response = self.client.post(self.claim_url)
+        self.assertEqual(response.data['id'], self.orders[0].id)
+
+        self.client.force_authenticate(self.another_user)
+        response = self.client.post(self.claim_url)
+        self.assertEqual(response.data['id'], self.orders[1].id)
+
+        response = self.client.post(self.claim_url)
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(
+            Order.objects.get(pk=self.orders[0].id).performer, self.user)
+
+    def test_complete_only_once(self):
+        url = reverse('api:orders-detail', kwargs={'pk': self.orders[0].id})
+        response = self.client.put(url)
+        self.assertEqual(response.status_code, 200)
+
+        self.client.force_authenticate(self.another_user)
+        response = self.client.put(url)
+        self.assertEqual(response.status_code, 400)
+        order = Order.objects.get(pk=self.orders[0].id)
+        self.assertTrue(order.complete)
+        self.assertEqual(order.performer, self.user)
+
+    def test_claimed_order_is_kept_by_performer(self):
+        self.client.post(self.claim_url)
+        url = reverse('api:orders-detail', kwargs={'pk': self.orders[0].id})
+
+        self.client.force_authenticate(self.another_user)
+        response = self.client.put(url)
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(
+            reverse('api:orders-complete'),
+            {'ids': [self.orders[0].id]}, format='json')
+        self.assertEqual(response.data['skipped'], [self.orders[0].id])
+        self.assertFalse(Order.objects.get(pk=self.orders[0].id).complete)
+
+        self.client.force_authenticate(self.user)
+        response = self.client.put(url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_stale_claim_is_released(self):
+        self.client.post(self.claim_url)
+        Order.objects.filter(pk=self.orders[0].id).update(
+            time_updated=timezone.now() - timedelta(hours=1))
+
+        self.client.force_authenticate(self.another_user)
+        response = self.client.post(self.claim_url)
+        self.assertEqual(response.data['id'], self.orders[0].id)
+        self.assertEqual(
+            Order.objects.get(pk=self.orders[0].id).performer,
+            self.another_user)
+
+    def test_claim_uses_one_write_path(self):
+        features = connection.features
+        for skip_locked in [True, False]:
+            with self.subTest(skip_locked=skip_locked), mock.patch.object(
+                    features, 'has_select_for_update_skip_locked',
+                    skip_locked), \
+                    CaptureQueriesContext(connection) as context:
+                self.client.post(self.claim_url)
+            queries = [
+                query['sql'] for query in context.captured_queries
+                if '"orders_order"' in query['sql']]
+            self.assertEqual(
+                len([sql for sql in queries if sql.startswith('UPDATE')]), 1)
+            self.assertFalse(any(
+                ' OR ' in sql for sql in queries
+                if sql.startswith('SELECT') and 'LIMIT 1' in sql))
+
+
+class OrderBulkCompleteTest(ApiBaseSetUp):
+    def setUp(self):
+        super().setUp()
+        self.orders = [
+            Order.objects.create(service=self.service) for _ in range(4)]
+        self.url = reverse('api:orders-complete')
+
+    def complete(self, ids):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(self.url, {'ids': ids}, format='json')
+        updates = [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith('UPDATE "orders_order"')]
+        self.assertEqual(len(updates), 1)
+        return response
+
+    def test_complete_by_ids(self):
+        Order.objects.mark_complete(self.orders[0].id, self.user)
+        ids = [order.id for order in self.orders[:3]]
+        response = self.complete(ids)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['completed'], ids[1:])
+        self.assertEqual(response.data['skipped'], ids[:1])
+        self.assertEqual(
+            Order.objects.filter(complete=True, performer=self.user).count(),
+            3)
+        self.assertEqual(
+            OrderCounter.objects.filter(
+                performer=self.user).get().completed, 3)
+
+        response = self.complete(ids)
+        self.assertEqual(response.data['completed'], [])
+
+    def test_complete_without_returning(self):
+        ids = [order.id for order in self.orders]
+        with mock.patch(
+                'orders.models.can_return_rows_from_update',
+                return_value=False):
+            response = self.complete(ids)
+        self.assertEqual(response.data['completed'], ids)
+
+    def test_complete_by_filter(self):
+        another_service = Service.objects.create(title='Другая услуга')
+        order = Order.objects.create(service=another_service)
+        response = self.client.post(
+            self.url, {'service': another_service.id}, format='json')
+        self.assertEqual(
+            response.data, {'completed': [order.id], 'has_more': False})
+        self.assertEqual(Order.objects.filter(complete=False).count(), 4)
+
+    def test_complete_by_filter_in_pages(self):
+        ids = [order.id for order in self.orders]
+        with mock.patch.object(OrderBulkCompleteSerializer, 'LIMIT', 3):
+            response = self.client.post(
+                self.url, {'service': self.service.id}, format='json')
+            self.assertEqual(
+                response.data, {'completed': ids[:3], 'has_more': True})
+            response = self.client.post(
+                self.url, {'service': self.service.id}, format='json')
+            self.assertEqual(
+                response.data, {'completed': ids[3:], 'has_more': False})
+
+    def test_complete_by_filter_with_stale_claims(self):
+        another_user = User.objects.create(username='another', is_staff=True)
+        stale = timezone.now() - timedelta(hours=1)
+        for order, performer in zip(
+                self.orders[:3], [self.user, another_user, another_user]):
+            Order.objects.filter(pk=order.id).update(
+                performer=performer, time_updated=stale)
+        Order.objects.filter(pk=self.orders[2].id).update(
+            time_updated=timezone.now())
+        response = self.client.post(
+            self.url, {'service': self.service.id}, format='json')
+        ids = [order.id for order in self.orders]
+        self.assertEqual(
+            response.data,
+            {'completed': [ids[0], ids[1], ids[3]], 'has_more': False})
+
+    def test_one_event_per_call(self):
+        ids = [order.id for order in self.orders]
+        with mock.patch('orders.models.publish_orders_event') as publish:
+            self.complete(ids)
+        publish.assert_called_once_with('orders_completed', 'ids', ids)
+
+    def test_filter_required(self):
+        response = self.client.post(self.url, {}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.filter(complete=True).exists())
+
+
+class OrderBatchTest(ApiBaseSetUp):
+    def setUp(self):
+        super().setUp()
+        self.customer = User.objects.create(username='customer')
+        self.client.force_authenticate(self.customer)
+        for title, type in [('Адрес', 'text'), ('Этаж', 'number')]:
+            ParameterInService.objects.create(
+                service=self.service, type=type,
+                parameter=Parameter.objects.create(title=title))
+        self.url = reverse('api:order-batches-list')
+
+    def make_batch(self, quantity):
+        return {'orders': [
+            {
+                'service': self.service.id,
+                'parameters': [
+                    {'parameter': 'Адрес', 'value': f'Дом {q}'},
+                    {'parameter': 'Этаж', 'value': str(q)},
+                ],
+            }
+            for q in range(quantity)
+        ]}
+
+    def test_create(self):
+        response = self.client.post(
+            self.url, self.make_batch(3), format='json')
+        self.assertEqual(response.status_code, 201)
+        orders = Order.objects.filter(id__in=response.data['ids'])
+        self.assertEqual(orders.filter(author=self.customer).count(), 3)
+        self.assertEqual(ParameterInOrder.objects.count(), 6)
+        self.assertEqual(
+            orders.get(id=response.data['ids'][1]).get_parameters(),
+            [{'parameter': 'Адрес', 'value': 'Дом 1'},
+             {'parameter': 'Этаж', 'value': '1'}])
+        self.assertEqual(OrderCounter.objects.get().created, 3)
+
+    def test_one_event_per_batch(self):
+        with mock.patch('orders.intake.publish_orders_event') as publish:
+            response = self.client.post(
+                self.url, self.make_batch(3), format='json')
+        publish.assert_called_once()
+        event, field, orders = publish.call_args.args
+        self.assertEqual((event, field), ('orders_created', 'orders'))
+        self.assertEqual(
+            [order['id'] for order in orders], response.data['ids'])
+
+    def test_parameters_inserted_at_once(self):
+        with CaptureQueriesContext(connection) as context:
+            self.client.post(self.url, self.make_batch(20), format='json')
+        inserts = [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith(
+                'INSERT INTO "orders_parameterinorder"')]
+        self.assertEqual(len(inserts), 1)
+
+    @skipUnless(
+        connection.features.can_return_rows_from_bulk_insert,
+        'Orders are inserted one by one without RETURNING')
+    def test_query_count_is_constant(self):
+        def count_queries(quantity):
+            with CaptureQueriesContext(connection) as context:
+                self.client.post(
+                    self.url, self.make_batch(quantity), format='json')
+            return len(context.captured_queries)
+
+        self.assertEqual(count_queries(10), count_queries(100))
+
+    def test_errors_per_order(self):
+        batch = self.make_batch(4)
+        batch['orders'][1]['service'] = self.service.id + 1
+        batch['orders'][2]['parameters'].append(
+            {'parameter': 'Цвет', 'value': 'синий'})
+        batch['orders'][3]['parameters'][1]['value'] = 'пятый'
+        response = self.client.post(self.url, batch, format='json')
+        self.assertEqual(response.status_code, 400)
+        errors = response.data['orders']
+        self.assertEqual(errors[0], {})
+        for index in [1, 2, 3]:
+            self.assertIn('non_field_errors', errors[index])
+        self.assertFalse(Order.objects.exists())
+
+    def test_validated_again_on_create(self):
+        batch = self.make_batch(2)
+        parameter = Parameter.objects.get(title='Этаж')
+        schema = {
+            'Адрес': {'parameter_id': parameter.id - 1, 'type': 'text'},
+            'Этаж': {'parameter_id': parameter.id, 'type': 'number'},
+        }
+        parameter.delete()
+        # The cached schema of the service is not updated yet.
+        with mock.patch(
+                'orders.intake.get_service_schema', return_value=schema):
+            response = self.client.post(self.url, batch, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('non_field_errors', response.data['orders'][0])
+        self.assertFalse(Order.objects.exists())
+
+    def test_staff_forbidden(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.post(
+            self.url, self.make_batch(1), format='json')
+        self.assertEqual(response.status_code, 403)
+
+
+class ArchivedOrderRetrieveTest(ApiBaseSetUp):
+    def test_retrieve_archived_order(self):
+        order = ArchivedOrder.objects.create(
+            id=100, service=self.service, time_created=timezone.now(),
+            time_updated=timezone.now())
+        response = self.client.get(
+            reverse('api:orders-detail', kwargs={'pk': order.id}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['id'], order.id)
+        self.assertTrue(response.data['complete'])
+
+    def test_archived_order_not_updated(self):
+        order = ArchivedOrder.objects.create(
+            id=100, service=self.service, time_created=timezone.now(),
+            time_updated=timezone.now())
+        response = self.client.put(
+            reverse('api:orders-detail', kwargs={'pk': order.id}))
+        self.assertEqual(response.status_code, 404)
+
+
+class OrderSnapshotReadTest(ApiBaseSetUp):
+    def test_list_does_not_touch_parameters(self):
+        snapshot = [{'parameter': 'Телефон', 'value': '123'}]
+        Order.objects.bulk_create(
+            Order(service=self.service, parameters_snapshot=snapshot)
+            for _ in range(5))
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('api:orders-list'))
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertEqual(
+            response.data['results'][0]['parameters_assigned'], snapshot)
+
+
+class ServiceCatalogTest(ApiBaseSetUp):
+    def setUp(self):
+        super().setUp()
+        self.user.is_staff = False
+        self.user.save()
+        for title, type in [('Этаж', 'number'), ('Адрес', 'text')]:
+            ParameterInService.objects.create(
+                service=self.service, type=type,
+                parameter=Parameter.objects.create(title=title))
+        self.url = reverse('api:services-list')
+        self.detail_url = reverse(
+            'api:services-detail', kwargs={'pk': self.service.id})
+
+    def test_list(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.json(), [{
+            'id': self.service.id,
+            'title': 'Услуга',
+            'parameters': [
+                {'parameter': 'Этаж', 'type': 'number'},
+                {'parameter': 'Адрес', 'type': 'text'},
+            ],
+        }])
+
+    def test_detail(self):
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response.json()['title'], 'Услуга')
+        response = self.client.get(
+            reverse('api:services-detail', kwargs={'pk': self.service.id + 1}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_served_from_cache(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response['ETag'], etag)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_invalidated_on_catalog_change(self):
+        etag = self.client.get(self.url)['ETag']
+        ParameterInService.objects.create(
+            service=self.service, type='checkbox',
+            parameter=Parameter.objects.create(title='Лифт'))
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            {'parameter': 'Лифт', 'type': 'checkbox'},
+            response.json()[0]['parameters'])
+
+    def test_catalog_cached_before_commit_not_kept(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.service.title = 'Новое название'
+            self.service.save()
+            # Other requests still read the old catalog before the commit.
+            etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class OrderCounterTest(ApiBaseSetUp):
+    def setUp(self):
+        super().setUp()
+        self.orders = [
+            Order.objects.create(service=self.service) for _ in range(3)]
+        for order in self.orders[:2]:
+            self.client.put(
+                reverse('api:orders-detail', kwargs={'pk': order.id}))
+        self.url = reverse('api:order-counters-list')
+
+    def test_counts_per_service(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data, [{
+            'service_id': self.service.id,
+            'service': self.service.title,
+            'created': 3,
+            'completed': 2,
+            'open': 1,
+        }])
+
+    def test_counts_per_performer(self):
+        response = self.client.get(self.url, {'group_by': 'performer'})
+        self.assertEqual(response.data, [{
+            'performer_id': self.user.id,
+            'performer': self.user.username,
+            'completed': 2,
+        }])
+
+    def test_rebuild(self):
+        expected = self.client.get(self.url, {'group_by': 'hour'}).data
+        OrderCounter.objects.update(created=100)
+        call_command('rebuild_order_counters', stdout=StringIO())
+        self.assertEqual(
+            self.client.get(self.url, {'group_by': 'hour'}).data, expected)
+
+
+class OrderSearchTest(ApiBaseSetUp):
+    def setUp(self):
+        super().setUp()
+        phone = Parameter.objects.create(title='Телефон')
+        address = Parameter.objects.create(title='Адрес')
+        self.order = Order.objects.create(service=self.service, complete=True)
+        self.other = Order.objects.create(service=self.service)
+        ParameterInOrder.objects.bulk_create([
+            ParameterInOrder(
+                order=self.order, parameter=phone, value='+7 900 123-45-67'),
+            ParameterInOrder(
+                order=self.order, parameter=address, value='Ленина, 5'),
+            ParameterInOrder(
+                order=self.other, parameter=address, value='ул. 900-летия'),
+        ])
+        self.url = reverse('api:orders-search')
+
+    def search(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.data['results']]
+
+    def test_search(self):
+        self.assertEqual(self.search(q='123-45'), [self.order.id])
+        self.assertEqual(self.search(q='ленина'), [self.order.id])
+        self.assertEqual(
+            self.search(q='900'), [self.order.id, self.other.id])
+        self.assertEqual(self.search(q='900', parameter='Адрес'), [
+            self.other.id])
+        self.assertEqual(self.search(q='90'), [self.order.id, self.other.id])
+
+    def test_search_follows_updates(self):
+        ParameterInOrder.objects.filter(value='Ленина, 5').update(
+            value='Мира, 1')
+        self.assertEqual(self.search(q='Ленина'), [])
+        self.assertEqual(self.search(q='Мира'), [self.order.id])
+
+    def test_query_required(self):
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+
+
+class OrderFilterTest(ApiBaseSetUp):
+    def setUp(self):
+        super().setUp()
+        self.another_service = Service.objects.create(title='Другая услуга')
+        self.orders = [
+            Order.objects.create(service=service)
+            for service in [self.service, self.another_service] * 3]
+        Order.objects.filter(id=self.orders[0].id).update(
+            complete=True, performer=self.user)
+        Order.objects.filter(id=self.orders[1].id).update(
+            time_created=timezone.now() - timedelta(days=10))
+        self.url = reverse('api:orders-list')
+
+    def get_ids(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.data['results']]
+
+    def test_filters(self):
+        ids = [order.id for order in self.orders]
+        self.assertEqual(self.get_ids(service=self.service.id), ids[2::2])
+        self.assertEqual(
+            self.get_ids(complete='true', performer=self.user.id), ids[:1])
+        self.assertEqual(
+            self.get_ids(
+                created_before=(
+                    timezone.now() - timedelta(days=1)).isoformat()),
+            ids[1:2])
+        self.assertEqual(
+            self.get_ids(
+                service=self.another_service.id,
+                created_after=(
+                    timezone.now() - timedelta(days=1)).isoformat()),
+            ids[3::2])
+
+    def test_descending_ordering(self):
+        expected = list(Order.objects.filter(complete=False).order_by(
+            '-time_created', '-id').values_list('id', flat=True))
+        ids = []
+        url = f'{self.url}?ordering=-time_created&page_size=2'
+        while url is not None:
+            response = self.client.get(url)
+            ids.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(ids, expected)
+
+    def test_invalid_params(self):
+        for params in [{'ordering': 'service'}, {'service': 'x'}]:
+            with self.subTest(params=params):
+                response = self.client.get(self.url, params)
+                self.assertEqual(response.status_code, 400)
+
+    def test_parameter_value_filters(self):
+        floor = Parameter.objects.create(title='Этаж')
+        lift = Parameter.objects.create(title='Лифт')
+        for order, number, checked in zip(
+                self.orders[2:], [5, 12, 40, 60], [True, False, True, False]):
+            ParameterInOrder.objects.create(
+                order=order, parameter=floor, value=str(number),
+                value_int=number)
+            ParameterInOrder.objects.create(
+                order=order, parameter=lift, value='', value_bool=checked)
+        ids = [order.id for order in self.orders[2:]]
+
+        self.assertEqual(
+            self.get_ids(parameter='Этаж', value_min=10, value_max=50),
+            ids[1:3])
+        self.assertEqual(self.get_ids(parameter='Лифт', checked='true'),
+                         [ids[0], ids[2]])
+        self.assertEqual(self.get_ids(parameter='Этаж'), ids)
+        response = self.client.get(self.url, {'value_min': 10})
+        self.assertEqual(response.status_code, 400)
+
+        queryset = ParameterInOrder.objects.filter(
+            parameter=floor, value_int__gte=10, value_int__lte=50,
+        ).values('order_id')
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET enable_seqscan = off')
+        if connection.vendor in ['sqlite', 'postgresql']:
+            self.assertIn('parameter_value_int_idx', queryset.explain())
+
+    @skipUnless(
+        connection.vendor == 'postgresql', 'EXPLAIN output is PostgreSQL')
+    def test_filters_use_indexes(self):
+        cases = [
+            ({'complete': 'false'}, 'order_complete_created_idx'),
+            ({'service': self.service.id}, 'order_service_created_idx'),
+            (
+                {'complete': 'true', 'performer': self.user.id},
+                'order_performer_created_idx',
+            ),
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute('SET enable_seqscan = off')
+        for params, index in cases:
+            with self.subTest(params=params):
+                request = Request(APIRequestFactory().get(self.url, params))
+                queryset = OrderFilterBackend().filter_queryset(
+                    request, Order.objects.all(), None,
+                ).order_by('time_created', 'id')
+                self.assertIn(index, queryset.explain())
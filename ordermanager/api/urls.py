@@ -8,6 +8,11 @@ app_name = 'api'
 router_v1 = DefaultRouter()
 router_v1.register(
     'orders', views.OrderListRetrieveUpdateViewSet, basename='orders')
+router_v1.register(
+    'order-batches', views.OrderBatchViewSet, basename='order-batches')
+router_v1.register('services', views.ServiceViewSet, basename='services')
+router_v1.register(
+    'order-counters', views.OrderCounterViewSet, basename='order-counters')
 
 urlpatterns = [
     path('v1/', include(router_v1.urls)),
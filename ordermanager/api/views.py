@@ -1,9 +1,37 @@
 from django.contrib.auth import get_user_model
-from rest_framework import mixins, permissions, viewsets
+from django.db import transaction
+from django.db.models import Sum
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from django.utils.cache import (
+    get_conditional_response, patch_vary_headers,
+)
+from django.utils.http import http_date
+from rest_framework import mixins, permissions, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
 
-from .permissions import IsStaffPermission
-from .serializers import OrderReadSerializer, OrderWriteSerializer
-from orders.models import Order
+from .filters import OrderFilterBackend
+from .pagination import OrderCursorPagination
+from .permissions import IsNotStaffPermission, IsStaffPermission
+from .renderers import OPTIONAL_RENDERER_CLASSES
+from .serializers import (
+    OrderBatchSerializer, OrderBulkCompleteSerializer,
+    OrderCounterQuerySerializer, OrderFilterSerializer, OrderReadSerializer,
+    OrderSearchQuerySerializer, OrderWriteSerializer, get_sparse_fields,
+)
+from orders.catalog import get_catalog_version, get_service_catalog
+from orders.fragments import get_order_list_version
+from orders.intake import create_orders
+from orders.models import ArchivedOrder, Order, OrderCounter
+from orders.open_orders import get_open_orders, is_materialized
+from orders.search import search_orders
+from orders.versions import (
+    get_catalog_etag, get_collection_etag, get_open_orders_etag,
+    get_order_etag, get_order_version,
+)
 
 User = get_user_model()
 
@@ -15,15 +43,265 @@ class OrderListRetrieveUpdateViewSet(
     viewsets.GenericViewSet,
 ):
     permission_classes = [permissions.IsAuthenticated, IsStaffPermission]
-    queryset = Order.objects.filter(complete=False).select_related('service')
+    pagination_class = OrderCursorPagination
+    filter_backends = [OrderFilterBackend]
+    renderer_classes = [
+        *api_settings.DEFAULT_RENDERER_CLASSES, *OPTIONAL_RENDERER_CLASSES]
+    queryset = Order.objects.with_parameters()
+    replica_actions = ['retrieve', 'search']
 
     def get_serializer_class(self):
-        if self.action in ['list', 'retrieve']:
+        if self.action in ['list', 'retrieve', 'claim', 'search']:
             return OrderReadSerializer
         return OrderWriteSerializer
 
     def get_queryset(self):
-        if self.action == 'list':
-            return Order.objects.filter(
-                complete=False).select_related('service')
-        return Order.objects.select_related('service')
+        if self.action not in ['list', 'retrieve']:
+            return Order.objects.select_related('service')
+        fields = get_sparse_fields(
+            self.request.query_params, OrderReadSerializer.Meta.fields)
+        queryset = Order.objects.all()
+        if 'service' in fields:
+            queryset = queryset.select_related('service')
+        if 'parameters_assigned' not in fields:
+            queryset = queryset.defer('parameters_snapshot')
+        return queryset
+
+    def filter_queryset(self, queryset):
+        if self.action != 'list':
+            return queryset
+        return super().filter_queryset(queryset)
+
+    def get_object(self):
+        try:
+            return super().get_object()
+        except Http404:
+            if self.action != 'retrieve':
+                raise
+        order = get_object_or_404(
+            ArchivedOrder.objects.with_parameters(), pk=self.kwargs['pk'])
+        self.check_object_permissions(self.request, order)
+        return order
+
+    def get_materialized_orders(self):
+        """Return materialized open orders when the list is not filtered."""
+        if not is_materialized():
+            return None
+        filters = OrderFilterSerializer().fields
+        if any(name in self.request.query_params for name in filters):
+            return None
+        return get_open_orders()
+
+    def list(self, request, *args, **kwargs):
+        open_orders = self.get_materialized_orders()
+        parts = [
+            get_catalog_version(), request.user.pk,
+            request.query_params.urlencode(), request.accepted_renderer.format]
+        if open_orders is None:
+            etag = get_collection_etag(get_order_list_version(), *parts)
+        else:
+            etag = get_open_orders_etag(open_orders, *parts)
+        response = get_conditional_response(request, etag=etag)
+        if response is None and open_orders is None:
+            response = super().list(request, *args, **kwargs)
+        elif response is None:
+            response = self.list_open_orders(open_orders)
+        response['ETag'] = etag
+        patch_vary_headers(response, ['Accept'])
+        return response
+
+    def list_open_orders(self, open_orders):
+        """Page materialized open orders, load the page by primary key."""
+        page = self.paginate_queryset(open_orders)
+        orders = self.get_queryset().filter(complete=False).in_bulk(
+            [entry.id for entry in page])
+        serializer = self.get_serializer(
+            [orders[entry.id] for entry in page if entry.id in orders],
+            many=True)
+        return self.get_paginated_response(serializer.data)
+
+    def retrieve(self, request, *args, **kwargs):
+        """Answer with 304 when the client already has the current order."""
+        try:
+            pk = int(kwargs['pk'])
+        except ValueError:
+            raise Http404
+        version = get_order_version(pk)
+        if version is None:
+            raise Http404
+        etag = get_order_etag(
+            pk, version, get_catalog_version(), request.user.pk,
+            request.accepted_renderer.format)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=int(version.timestamp()))
+        if response is None:
+            response = super().retrieve(request, *args, **kwargs)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(version.timestamp())
+        patch_vary_headers(response, ['Accept'])
+        return response
+
+    @action(detail=False, methods=['post'])
+    def claim(self, request):
+        """Assign the oldest unclaimed open order to the current user."""
+        order = Order.objects.claim_next(request.user)
+        if order is None:
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        order = Order.objects.with_parameters().get(pk=order.pk)
+        return Response(self.get_serializer(order).data)
+
+    @action(detail=False, methods=['post'], url_path='complete')
+    def complete(self, request):
+        """Complete open orders by ids or by a filter at once.
+
+        Return ids of the orders this request completed, ids already
+        completed or claimed by somebody else are returned as skipped. A
+        filter completes at most ``LIMIT`` oldest orders per request,
+        ``has_more`` tells whether the filter matches more of them.
+        """
+        query = OrderBulkCompleteSerializer(data=request.data)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+
+        orders = Order.objects.all()
+        if 'ids' in params:
+            orders = orders.filter(pk__in=params['ids'])
+        if 'service' in params:
+            orders = orders.filter(service_id=params['service'])
+        if 'created_after' in params:
+            orders = orders.filter(time_created__gte=params['created_after'])
+        if 'created_before' in params:
+            orders = orders.filter(time_created__lt=params['created_before'])
+
+        if 'ids' not in params:
+            limit = OrderBulkCompleteSerializer.LIMIT
+            ids = orders.oldest_available(limit + 1, request.user)
+            orders = Order.objects.filter(pk__in=ids[:limit])
+
+        completed = orders.complete_open(request.user)
+        data = {'completed': completed}
+        if 'ids' in params:
+            data['skipped'] = sorted(set(params['ids']) - set(completed))
+        else:
+            data['has_more'] = len(ids) > limit
+        return Response(data)
+
+    @action(detail=False)
+    def search(self, request):
+        """Find orders, completed ones included, by parameter values."""
+        query = OrderSearchQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+        orders = search_orders(
+            params['q'], params.get('parameter'), params.get('service'),
+            queryset=Order.objects.with_parameters())
+        page = self.paginate_queryset(orders)
+        return self.get_paginated_response(
+            self.get_serializer(page, many=True).data)
+
+
+class OrderBatchViewSet(viewsets.ViewSet):
+    """Create a batch of orders in one request.
+
+    Either every order of the batch is created or none, errors are
+    reported per order in the order of the batch.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsNotStaffPermission]
+
+    @transaction.atomic
+    def create(self, request):
+        batch = OrderBatchSerializer(data=request.data)
+        batch.is_valid(raise_exception=True)
+        orders, errors = create_orders([
+            dict(item, author_id=request.user.id)
+            for item in batch.validated_data['orders']])
+        if any(errors):
+            # Services changed since the batch was validated, the orders
+            # created so far are rolled back with the transaction.
+            raise ValidationError({'orders': [
+                {'non_field_errors': item} if item else {}
+                for item in errors]})
+        return Response(
+            {'ids': [order.id for order in orders]},
+            status=status.HTTP_201_CREATED)
+
+
+class ServiceViewSet(viewsets.ViewSet):
+    """Services with the parameters of their order forms.
+
+    The catalog is served from the cache and its ETag is the catalog
+    version, so revalidating it costs no database queries.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = [
+        *api_settings.DEFAULT_RENDERER_CLASSES, *OPTIONAL_RENDERER_CLASSES]
+    lookup_value_regex = r'\d+'
+
+    def get_catalog_response(self, request, get_data, *parts):
+        version = get_catalog_version()
+        etag = get_catalog_etag(
+            version, *parts, request.accepted_renderer.format)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = Response(get_data(get_service_catalog(version)))
+        response['ETag'] = etag
+        patch_vary_headers(response, ['Accept'])
+        return response
+
+    def list(self, request):
+        return self.get_catalog_response(request, lambda catalog: catalog)
+
+    def retrieve(self, request, pk):
+        def get_service(catalog):
+            for service in catalog:
+                if service['id'] == int(pk):
+                    return service
+            raise Http404
+
+        return self.get_catalog_response(request, get_service, pk)
+
+
+class OrderCounterViewSet(viewsets.ViewSet):
+    """Order counts per service, performer or hour.
+
+    Counts are summed over the hourly counters, so the cost depends on the
+    number of buckets rather than on the number of orders.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsStaffPermission]
+    groupings = {
+        'service': {'service_id': 'service_id', 'service__title': 'service'},
+        'performer': {
+            'performer_id': 'performer_id',
+            'performer__username': 'performer',
+        },
+        'hour': {'hour': 'hour'},
+    }
+
+    def list(self, request):
+        query = OrderCounterQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+
+        counters = OrderCounter.objects.all()
+        if 'service' in params:
+            counters = counters.filter(service_id=params['service'])
+        if 'hour_from' in params:
+            counters = counters.filter(hour__gte=params['hour_from'])
+        if 'hour_to' in params:
+            counters = counters.filter(hour__lt=params['hour_to'])
+        if params['group_by'] == 'performer':
+            counters = counters.filter(performer__isnull=False)
+
+        grouping = self.groupings[params['group_by']]
+        data = []
+        for row in counters.values(*grouping).annotate(
+            created=Sum('created'), completed=Sum('completed'),
+        ).order_by(*grouping):
+            item = {name: row[field] for field, name in grouping.items()}
+            if params['group_by'] != 'performer':
+                item['created'] = row['created']
+            item['completed'] = row['completed']
+            if params['group_by'] == 'service':
+                item['open'] = row['created'] - row['completed']
+            data.append(item)
+        return Response(data)
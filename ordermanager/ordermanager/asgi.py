@@ -1,7 +1,65 @@
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ordermanager.settings')
 
-application = get_asgi_application()
+django.setup(set_prefix=False)
+
+from orders.feed import ORDER_FEED_PATH, order_feed  # noqa: E402
+
+
+class StreamingASGIHandler(ASGIHandler):
+    """ASGI handler that consumes streaming responses outside the event loop.
+
+    Django iterates streaming content right in the event loop, where
+    iterators reading the database are not allowed to run.
+    """
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+
+        headers = []
+        for header, value in response.items():
+            if isinstance(header, str):
+                header = header.encode('ascii')
+            if isinstance(value, str):
+                value = value.encode('latin1')
+            headers.append((bytes(header), bytes(value)))
+        for cookie in response.cookies.values():
+            headers.append((
+                b'Set-Cookie',
+                cookie.output(header='').encode('ascii').strip(),
+            ))
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': headers,
+        })
+
+        parts = iter(response)
+        next_part = sync_to_async(next, thread_sensitive=True)
+        while True:
+            part = await next_part(parts, None)
+            if part is None:
+                break
+            for chunk, _ in self.chunk_bytes(part):
+                await send({
+                    'type': 'http.response.body',
+                    'body': chunk,
+                    'more_body': True,
+                })
+        await send({'type': 'http.response.body'})
+        await sync_to_async(response.close, thread_sensitive=True)()
+
+
+django_application = StreamingASGIHandler()
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] == ORDER_FEED_PATH:
+        return await order_feed(scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -0,0 +1,234 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+
+from orders.intake import get_intake_stats, is_buffered
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT, LATENCY, QUERIES, QUERY_SECONDS, RESPONSE_BYTES = range(5)
+BUCKETS_START = 5
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class QueryCounter:
+    """Database execute wrapper counting queries and their duration."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+class MetricsRegistry:
+    """Request metrics aggregated per view, method and status.
+
+    Every series is a flat list of counters, so recording a request is a
+    handful of additions. With ``directory`` set each process periodically
+    writes its counters to a file of its own there, and the exposition
+    sums the files of all processes. Files of processes that have exited
+    are removed, their counters are gone as after a restart.
+    """
+
+    def __init__(self, directory=None, flush_interval=5):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.series = {}
+        self.lock = threading.Lock()
+        self.flushed = time.monotonic()
+
+    def observe(self, view, method, status, latency, queries, query_seconds,
+                response_bytes):
+        key = (view, method, str(status))
+        with self.lock:
+            values = self.series.get(key)
+            if values is None:
+                values = self.series[key] = [0] * (
+                    BUCKETS_START + len(LATENCY_BUCKETS))
+            values[COUNT] += 1
+            values[LATENCY] += latency
+            values[QUERIES] += queries
+            values[QUERY_SECONDS] += query_seconds
+            values[RESPONSE_BYTES] += response_bytes
+            bucket = bisect_left(LATENCY_BUCKETS, latency)
+            if bucket < len(LATENCY_BUCKETS):
+                values[BUCKETS_START + bucket] += 1
+
+        if (self.directory
+                and time.monotonic() - self.flushed > self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """Write counters of this process to its file in the directory."""
+        with self.lock:
+            snapshot = [
+                [list(key), values] for key, values in self.series.items()]
+            self.flushed = time.monotonic()
+        path = os.path.join(self.directory, f'{os.getpid()}.json')
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w') as output:
+            json.dump(snapshot, output)
+        os.replace(temporary, path)
+
+    def collect(self):
+        """Return counters of all processes summed per series."""
+        if not self.directory:
+            with self.lock:
+                return {
+                    key: list(values) for key, values in self.series.items()}
+
+        self.flush()
+        series = {}
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.directory, name)
+            pid = name[:-len('.json')]
+            if pid.isdigit() and not is_running(int(pid)):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            try:
+                with open(path) as source:
+                    snapshot = json.load(source)
+            except (OSError, ValueError):
+                continue
+            for key, values in snapshot:
+                total = series.setdefault(tuple(key), [0] * len(values))
+                for index, value in enumerate(values):
+                    total[index] += value
+        return series
+
+    def render(self):
+        """Render all series in the Prometheus text exposition format."""
+        series = sorted(self.collect().items())
+        lines = [
+            '# HELP ordermanager_http_request_duration_seconds '
+            'Request latency by view.',
+            '# TYPE ordermanager_http_request_duration_seconds histogram',
+        ]
+        for key, values in series:
+            labels = format_labels(key)
+            cumulative = 0
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                cumulative += values[BUCKETS_START + index]
+                lines.append(
+                    'ordermanager_http_request_duration_seconds_bucket'
+                    f'{{{labels},le="{bound}"}} {cumulative}')
+            lines.extend([
+                'ordermanager_http_request_duration_seconds_bucket'
+                f'{{{labels},le="+Inf"}} {values[COUNT]}',
+                'ordermanager_http_request_duration_seconds_sum'
+                f'{{{labels}}} {values[LATENCY]}',
+                'ordermanager_http_request_duration_seconds_count'
+                f'{{{labels}}} {values[COUNT]}',
+            ])
+
+        for name, index, help_text in [
+            ('ordermanager_db_queries_total', QUERIES,
+             'SQL queries executed by view.'),
+            ('ordermanager_db_query_duration_seconds_total', QUERY_SECONDS,
+             'Time spent in SQL queries by view.'),
+            ('ordermanager_http_response_size_bytes_total', RESPONSE_BYTES,
+             'Size of non-streaming responses by view.'),
+        ]:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} counter')
+            for key, values in series:
+                lines.append(f'{name}{{{format_labels(key)}}} {values[index]}')
+        return '\n'.join(lines) + '\n'
+
+
+def is_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def format_labels(key):
+    view, method, status = (
+        value.replace('\\', '\\\\').replace('"', '\\"') for value in key)
+    return f'view="{view}",method="{method}",status="{status}"'
+
+
+registry = MetricsRegistry(
+    directory=getattr(settings, 'METRICS_DIR', None),
+    flush_interval=getattr(settings, 'METRICS_FLUSH_INTERVAL', 5),
+)
+
+
+class MetricsMiddleware:
+    """Record latency, SQL queries and response size of every request."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+        latency = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        registry.observe(
+            match.view_name if match else '<unresolved>',
+            request.method,
+            response.status_code,
+            latency,
+            counter.count,
+            counter.duration,
+            0 if response.streaming else len(response.content),
+        )
+        return response
+
+
+def render_intake_metrics():
+    """Render the state of the buffered order intake as gauges."""
+    lines = []
+    for name, value in get_intake_stats().items():
+        metric = f'ordermanager_order_intake_{name}'
+        lines.append(f'# TYPE {metric} gauge')
+        lines.append(f'{metric} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics(request):
+    """Expose request metrics for Prometheus.
+
+    With ``METRICS_TOKEN`` set a bearer token is required, otherwise only
+    staff users may read the metrics.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token:
+        allowed = request.headers.get('Authorization') == f'Bearer {token}'
+    else:
+        allowed = request.user.is_staff
+    if not allowed:
+        return HttpResponseForbidden()
+    content = registry.render()
+    if is_buffered():
+        content += render_intake_metrics()
+    return HttpResponse(content, content_type=PROMETHEUS_CONTENT_TYPE)
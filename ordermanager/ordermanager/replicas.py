@@ -0,0 +1,104 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+
+PRIMARY_COOKIE = 'use_primary'
+SAFE_METHODS = ('GET', 'HEAD')
+# Logging in and out must take effect on the next request.
+PRIMARY_APPS = ('auth', 'sessions')
+
+routing = ContextVar('routing', default=None)
+
+
+class RoutingState:
+    """How the databases are used while handling one request."""
+
+    def __init__(self, sticky):
+        self.sticky = sticky
+        self.read_replica = False
+        self.wrote = False
+        self.replica = None
+
+
+class ReplicaRouter:
+    """Send reads of read-only views to replicas and writes to the primary.
+
+    Only views marked by ``ReplicaRoutingMiddleware`` read from a replica,
+    everything else, including management commands, stays on ``default``.
+    Users and sessions are always read from ``default``.
+    Once a request writes, its remaining reads go to the primary as well.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = routing.get()
+        replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+        if model._meta.app_label in PRIMARY_APPS:
+            return None
+        if state is not None and state.read_replica and replicas:
+            # One replica per request, a version and the data it describes
+            # must come from the same one.
+            if state.replica is None:
+                state.replica = random.choice(replicas)
+            return state.replica
+        return None
+
+    def db_for_write(self, model, **hints):
+        state = routing.get()
+        if state is not None:
+            state.read_replica = False
+            state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+
+def reads_from_replica(request, view_func):
+    """Return whether the view only reads for this request.
+
+    Django views are marked with ``read_from_replica = True``, viewsets list
+    their read-only actions in ``replica_actions``. Responses cached or
+    tagged with global versions bumped on the primary must not be read
+    from a replica, it could store old data under a new version. A single
+    order is fine, its version is read from the same replica.
+    """
+    if request.method not in SAFE_METHODS:
+        return False
+    actions = getattr(view_func, 'actions', None)
+    if actions is not None:
+        action = actions.get('get')
+        return action in getattr(view_func.cls, 'replica_actions', ())
+    view_class = getattr(view_func, 'view_class', None)
+    return getattr(view_class, 'read_from_replica', False)
+
+
+class ReplicaRoutingMiddleware:
+    """Route read-only views to replicas, keep writers on the primary.
+
+    A response to a request that wrote sets a cookie for
+    ``REPLICA_STICKY_SECONDS``, so that the client reads its own writes
+    from the primary until the replicas catch up.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = RoutingState(sticky=PRIMARY_COOKIE in request.COOKIES)
+        token = routing.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            routing.reset(token)
+        if state.wrote:
+            response.set_cookie(
+                PRIMARY_COOKIE, '1',
+                max_age=getattr(settings, 'REPLICA_STICKY_SECONDS', 10),
+                httponly=True, samesite='Lax')
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = routing.get()
+        if state is not None and not state.sticky:
+            state.read_replica = reads_from_replica(request, view_func)
@@ -24,6 +24,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'ordermanager.metrics.MetricsMiddleware',
+    'ordermanager.replicas.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -65,6 +67,58 @@ DATABASES = {
     }
 }
 
+# Read-only views read from replicas: PostgreSQL hosts or, to try the routing
+# locally, SQLite files separated by commas. A client that wrote reads from
+# the primary for REPLICA_STICKY_SECONDS, until the replicas catch up.
+DATABASE_REPLICAS = []
+for index, replica in enumerate(
+        filter(None, os.environ.get('DB_REPLICAS', '').split(','))):
+    alias = f'replica_{index}'
+    if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+        DATABASES[alias] = dict(DATABASES['default'], NAME=replica)
+    else:
+        DATABASES[alias] = dict(
+            DATABASES['default'], HOST=replica, TEST={'MIRROR': 'default'})
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['ordermanager.replicas.ReplicaRouter']
+
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 10))
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
+# Cache backends every process has its own copy of, see orders.checks.
+PROCESS_LOCAL_CACHES = [
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+]
+
+SHARED_CACHE = CACHES['default']['BACKEND'] not in PROCESS_LOCAL_CACHES
+
+# With a cache shared by all processes sessions and the logged in user are
+# read from it, so authenticated requests do not query the database. A
+# process-local cache would keep serving sessions and users another process
+# has already changed, see orders.checks.
+SESSION_ENGINE = os.environ.get(
+    'SESSION_ENGINE',
+    'django.contrib.sessions.backends.cached_db' if SHARED_CACHE
+    else 'django.contrib.sessions.backends.db')
+
+AUTHENTICATION_BACKENDS = [
+    os.environ.get(
+        'AUTHENTICATION_BACKEND',
+        'orders.backends.CachedModelBackend' if SHARED_CACHE
+        else 'django.contrib.auth.backends.ModelBackend'),
+]
+
+USER_CACHE_TIMEOUT = int(os.environ.get('USER_CACHE_TIMEOUT', 5 * 60))
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -103,3 +157,20 @@ LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# With 'buffered' new orders are queued and created in batches by the
+# flush_order_intake command, which must be running then.
+ORDER_INTAKE_MODE = os.environ.get('ORDER_INTAKE_MODE', 'direct')
+ORDER_INTAKE_MAX_PENDING = int(os.environ.get('ORDER_INTAKE_MAX_PENDING', 10000))
+
+# An order claimed longer ago than this goes back to the work queue, any
+# staff member can claim or complete it then.
+ORDER_CLAIM_TIMEOUT = int(os.environ.get('ORDER_CLAIM_TIMEOUT', 30 * 60))
+
+# With 'materialized' the lists of open orders are served from a structure in
+# the cache kept up to date by order events. It needs a cache shared by all
+# processes and the reconcile_open_orders command running.
+ORDER_LIST_MODE = os.environ.get('ORDER_LIST_MODE', 'database')
+
+METRICS_DIR = os.environ.get('METRICS_DIR')
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
@@ -0,0 +1,210 @@
+import os
+import tempfile
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.db import router
+from django.http import HttpResponse
+from django.shortcuts import reverse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import resolve
+
+from ordermanager.metrics import MetricsRegistry, registry
+from ordermanager.replicas import PRIMARY_COOKIE, ReplicaRoutingMiddleware
+from orders.models import Order, Parameter, ParameterInOrder, Service
+
+User = get_user_model()
+
+
+class MetricsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='someuser', is_staff=True)
+        self.client.force_login(self.user)
+
+    def test_requests_are_recorded(self):
+        self.client.get(reverse('orders:order_list'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        content = response.content.decode()
+        self.assertIn(
+            'ordermanager_http_request_duration_seconds_count'
+            '{view="orders:order_list",method="GET",status="200"}',
+            content)
+        self.assertIn('ordermanager_db_queries_total', content)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token_required(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        response = self.client.get(
+            reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+
+    def test_denied_without_token_to_non_staff(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+
+    @override_settings(ORDER_INTAKE_MODE='buffered')
+    def test_intake_gauges(self):
+        content = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('ordermanager_order_intake_pending 0', content)
+        self.assertIn(
+            'ordermanager_order_intake_average_latency_seconds', content)
+
+    def test_processes_are_summed(self):
+        with tempfile.TemporaryDirectory() as directory:
+            other = MetricsRegistry(directory)
+            other.observe('view', 'GET', 200, 0.5, 3, 0.25, 10)
+            other.flush()
+            os.rename(
+                os.path.join(directory, f'{os.getpid()}.json'),
+                os.path.join(directory, 'other.json'))
+
+            current = MetricsRegistry(directory)
+            current.observe('view', 'GET', 200, 0.25, 1, 0.25, 20)
+            values = current.collect()[('view', 'GET', '200')]
+        self.assertEqual(values[:5], [2, 0.75, 4, 0.5, 30])
+
+    def test_files_of_exited_processes_are_removed(self):
+        with tempfile.TemporaryDirectory() as directory:
+            other = MetricsRegistry(directory)
+            other.observe('view', 'GET', 200, 0.5, 3, 0.25, 10)
+            other.flush()
+            exited = os.path.join(directory, f'{2 ** 22 + 1}.json')
+            os.rename(
+                os.path.join(directory, f'{os.getpid()}.json'), exited)
+
+            self.assertEqual(MetricsRegistry(directory).collect(), {})
+            self.assertFalse(os.path.exists(exited))
+
+    def tearDown(self):
+        registry.series.clear()
+
+
+@override_settings(DATABASE_REPLICAS=['replica_0'], REPLICA_STICKY_SECONDS=5)
+class ReplicaRoutingTest(TestCase):
+    def route(self, method, path, cookies=None, write=False):
+        """Return databases read from before and after an optional write."""
+        request = getattr(RequestFactory(), method)(path)
+        request.COOKIES.update(cookies or {})
+        reads = []
+
+        def get_response(request):
+            match = resolve(request.path_info)
+            middleware.process_view(
+                request, match.func, match.args, match.kwargs)
+            reads.append(router.db_for_read(Order))
+            if write:
+                router.db_for_write(Order)
+                reads.append(router.db_for_read(Order))
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        self.response = middleware(request)
+        return reads
+
+    def test_read_only_views_read_from_replica(self):
+        for path in [
+            reverse('orders:service_list'),
+            reverse('orders:order_list'),
+            reverse('orders:order_detail', kwargs={'pk': 1}),
+            reverse('api:orders-detail', kwargs={'pk': 1}),
+            reverse('api:orders-search'),
+        ]:
+            with self.subTest(path=path):
+                self.assertEqual(self.route('get', path), ['replica_0'])
+
+    def test_other_views_read_from_primary(self):
+        for path in [
+            reverse('orders:order_export'),
+            reverse('api:orders-list'),
+            reverse('api:services-list'),
+            reverse('api:services-detail', kwargs={'pk': 1}),
+        ]:
+            with self.subTest(path=path):
+                self.assertEqual(self.route('get', path), ['default'])
+        self.assertEqual(
+            self.route('post', reverse('orders:order_list')), ['default'])
+        self.assertEqual(
+            self.route('post', reverse('api:orders-complete')), ['default'])
+
+    def test_writer_sticks_to_primary(self):
+        path = reverse('orders:order_list')
+        self.assertEqual(
+            self.route('get', path, write=True), ['replica_0', 'default'])
+        cookie = self.response.cookies[PRIMARY_COOKIE]
+        self.assertEqual(cookie['max-age'], 5)
+        self.assertEqual(
+            self.route('get', path, cookies={PRIMARY_COOKIE: '1'}),
+            ['default'])
+        self.assertNotIn(PRIMARY_COOKIE, self.response.cookies)
+
+    @override_settings(DATABASE_REPLICAS=[f'replica_{n}' for n in range(8)])
+    def test_one_replica_per_request(self):
+        request = RequestFactory().get(reverse('api:orders-search'))
+        match = resolve(request.path_info)
+        reads = []
+
+        def get_response(request):
+            middleware.process_view(
+                request, match.func, match.args, match.kwargs)
+            reads.extend(router.db_for_read(Order) for _ in range(10))
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        middleware(request)
+        self.assertEqual(len(set(reads)), 1)
+
+    def test_sessions_and_users_read_from_primary(self):
+        request = RequestFactory().get(reverse('orders:order_list'))
+        match = resolve(request.path_info)
+        reads = []
+
+        def get_response(request):
+            middleware.process_view(
+                request, match.func, match.args, match.kwargs)
+            reads.extend(
+                router.db_for_read(model) for model in [Session, User])
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        middleware(request)
+        self.assertEqual(reads, ['default', 'default'])
+
+    def test_outside_requests_use_primary(self):
+        self.assertEqual(router.db_for_read(Order), 'default')
+
+
+@skipUnless(settings.DATABASE_REPLICAS, 'DB_REPLICAS is not set')
+class ReplicaDatabaseTest(TestCase):
+    """Run with a replica, e.g. ``DB_REPLICAS=replica.sqlite3``."""
+    databases = '__all__'
+
+    def setUp(self):
+        self.replica = settings.DATABASE_REPLICAS[0]
+        for alias in ['default', self.replica]:
+            user = User.objects.db_manager(alias).create(
+                pk=1, username='someuser', is_staff=True)
+            Service.objects.using(alias).create(pk=1, title='Услуга')
+            Parameter.objects.using(alias).create(pk=1, title='Адрес')
+        self.order = Order.objects.create(service_id=1)
+        ParameterInOrder.objects.create(
+            order=self.order, parameter_id=1, value='Дом 1')
+        self.client.force_login(user)
+
+    def search(self):
+        response = self.client.get(reverse('api:orders-search'), {'q': 'Дом'})
+        return [order['id'] for order in response.json()['results']]
+
+    def test_reads_follow_writes(self):
+        self.assertEqual(self.search(), [])
+
+        response = self.client.post(
+            reverse('api:orders-complete'), {'ids': [self.order.pk]},
+            content_type='application/json')
+        self.assertEqual(response.json()['completed'], [self.order.pk])
+        self.assertEqual(self.search(), [self.order.pk])
+
+        del self.client.cookies[PRIMARY_COOKIE]
+        self.assertEqual(self.search(), [])
@@ -5,6 +5,8 @@ from django.contrib import admin
 from django.contrib.auth.views import LoginView, LogoutView
 from django.urls import include, path
 
+from .metrics import metrics
+
 handler400 = 'ordermanager.views.bad_request'  # noqa
 handler403 = 'ordermanager.views.permission_denied'  # noqa
 handler404 = 'ordermanager.views.page_not_found'  # noqa
@@ -15,5 +17,6 @@ urlpatterns = [
     path('login/', LoginView.as_view(), name='login'),
     path('logout/', LogoutView.as_view(), name='logout'),
     path('api/', include('api.urls', namespace='api')),
+    path('metrics', metrics, name='metrics'),
     path('', include('orders.urls', namespace='orders')),
 ]
@@ -1,12 +1,127 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
 
 from .models import (
-    Order, ParameterInOrder, Service, Parameter,
-    ParameterInService,
+    ArchivedOrder, ArchivedParameterInOrder, Order, OrderIntake,
+    ParameterInOrder, Service, Parameter, ParameterInService,
 )
 
-admin.site.register(Order)
-admin.site.register(ParameterInOrder)
-admin.site.register(Service)
-admin.site.register(Parameter)
-admin.site.register(ParameterInService)
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that takes the count of large lists from the planner.
+
+    On PostgreSQL the number of rows is read from ``EXPLAIN`` instead of
+    running ``COUNT(*)`` over the whole table. Lists the planner expects to
+    be smaller than ``estimate_threshold`` are still counted exactly, so
+    the estimate is only ever used where an exact count would be slow.
+    """
+    estimate_threshold = 100000
+
+    @cached_property
+    def count(self):
+        estimate = self.estimate_count()
+        if estimate is None or estimate < self.estimate_threshold:
+            return super().count
+        return estimate
+
+    def estimate_count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        return int(plan[0]['Plan']['Plan Rows'])
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelist that does not count or load whole large tables.
+
+    Search looks up the number typed in by ``search_fields[0]`` exactly,
+    so that it uses the index instead of matching text.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+    search_fields = ['id']
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        if not search_term.isdigit():
+            return queryset.none(), False
+        return queryset.filter(**{self.search_fields[0]: search_term}), False
+
+
+@admin.register(Service)
+class ServiceAdmin(admin.ModelAdmin):
+    search_fields = ['title']
+
+
+@admin.register(Parameter)
+class ParameterAdmin(admin.ModelAdmin):
+    search_fields = ['title']
+
+
+@admin.register(ParameterInService)
+class ParameterInServiceAdmin(admin.ModelAdmin):
+    list_display = ['service', 'parameter', 'type']
+    list_select_related = ['service', 'parameter']
+    list_filter = ['service']
+    autocomplete_fields = ['service', 'parameter']
+
+
+@admin.register(Order)
+class OrderAdmin(LargeTableAdmin):
+    list_display = [
+        'id', 'service', 'author', 'performer', 'complete', 'time_created']
+    list_select_related = ['service', 'author', 'performer']
+    list_filter = ['complete', 'service']
+    raw_id_fields = ['author', 'performer']
+    autocomplete_fields = ['service']
+
+
+@admin.register(ParameterInOrder)
+class ParameterInOrderAdmin(LargeTableAdmin):
+    list_display = ['id', 'order', 'parameter', 'value']
+    list_select_related = ['order__service', 'parameter']
+    list_filter = ['parameter']
+    search_fields = ['order_id']
+    raw_id_fields = ['order']
+    autocomplete_fields = ['parameter']
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(LargeTableAdmin):
+    list_display = [
+        'id', 'service', 'author', 'performer', 'time_created',
+        'time_archived']
+    list_select_related = ['service', 'author', 'performer']
+    list_filter = ['service']
+    raw_id_fields = ['author', 'performer']
+    autocomplete_fields = ['service']
+
+
+@admin.register(ArchivedParameterInOrder)
+class ArchivedParameterInOrderAdmin(LargeTableAdmin):
+    list_display = ['id', 'order', 'parameter', 'value']
+    list_select_related = ['order__service', 'parameter']
+    list_filter = ['parameter']
+    search_fields = ['order_id']
+    raw_id_fields = ['order']
+    autocomplete_fields = ['parameter']
+
+
+@admin.register(OrderIntake)
+class OrderIntakeAdmin(LargeTableAdmin):
+    list_display = [
+        'id', 'service', 'author', 'time_received', 'time_flushed', 'order',
+        'error']
+    list_select_related = ['service', 'author', 'order__service']
+    raw_id_fields = ['author', 'order']
+    autocomplete_fields = ['service']
@@ -0,0 +1,57 @@
+from django.db import transaction
+from django.db.models.functions import Coalesce
+
+from .models import (
+    ArchivedOrder, ArchivedParameterInOrder, Order, OrderIntake,
+    ParameterInOrder,
+)
+
+ARCHIVE_BATCH_SIZE = 1000
+ORDER_ARCHIVE_FIELDS = [
+    'id', 'author_id', 'service_id', 'time_created', 'complete',
+    'time_completed', 'time_updated', 'performer_id', 'parameters_snapshot',
+]
+
+
+def archive_batch(completed_before, batch_size=ARCHIVE_BATCH_SIZE):
+    """Move one batch of completed orders to the archive tables.
+
+    Orders completed before ``completed_before`` are archived, orders
+    without a completion time are taken by their creation time. The batch
+    is copied and deleted in one transaction, so an interrupted run leaves
+    every order either in the hot tables or in the archive. Return the
+    number of archived orders.
+    """
+    with transaction.atomic():
+        orders = list(
+            Order.objects.alias(
+                completed=Coalesce('time_completed', 'time_created'),
+            ).filter(
+                complete=True, completed__lt=completed_before,
+            ).order_by('time_created', 'id').select_for_update(
+                skip_locked=True,
+            ).values(*ORDER_ARCHIVE_FIELDS)[:batch_size]
+        )
+        if not orders:
+            return 0
+        ids = [order['id'] for order in orders]
+
+        ArchivedOrder.objects.bulk_create(
+            ArchivedOrder(**order) for order in orders)
+        ArchivedParameterInOrder.objects.bulk_create(
+            ArchivedParameterInOrder(**parameter)
+            for parameter in ParameterInOrder.objects.filter(
+                order_id__in=ids,
+            ).values(
+                'order_id', 'parameter_id', 'value', 'value_int', 'value_bool')
+        )
+
+        # Deleted without loading the rows and sending a signal per row.
+        # Only completed orders are archived, the open order list and the
+        # materialized open orders stay as they are.
+        OrderIntake.objects.filter(order_id__in=ids).update(order=None)
+        parameters = ParameterInOrder.objects.filter(order_id__in=ids)
+        parameters._raw_delete(parameters.db)
+        archived = Order.objects.filter(id__in=ids)
+        archived._raw_delete(archived.db)
+    return len(orders)
@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+USER_CACHE_KEY = 'orders:user:{user_id}'
+USER_CACHE_TIMEOUT = 5 * 60
+
+
+def get_user_cache_key(user_id):
+    return USER_CACHE_KEY.format(user_id=user_id)
+
+
+def invalidate_cached_user(user_id):
+    cache.delete(get_user_cache_key(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    """Model backend that reads the logged in user from the cache.
+
+    The cached user is dropped whenever it is saved or deleted and on
+    logout, so a changed password or staff flag takes effect on the next
+    request. Changes made with ``QuerySet.update()`` bypass this and only
+    show up after ``USER_CACHE_TIMEOUT``.
+    """
+
+    def get_user(self, user_id):
+        key = get_user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user_model = get_user_model()
+            try:
+                user = user_model._default_manager.get(pk=user_id)
+            except user_model.DoesNotExist:
+                return None
+            cache.set(key, user, getattr(
+                settings, 'USER_CACHE_TIMEOUT', USER_CACHE_TIMEOUT))
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,191 @@
+import math
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.shortcuts import reverse
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from .models import (
+    Order, Parameter, ParameterInOrder, ParameterInService, Service,
+    build_parameters_snapshot,
+)
+
+User = get_user_model()
+
+SEED_BATCH_SIZE = 1000
+INTAKE_BATCH_ORDERS = 100
+BENCHMARK_METRICS = ['p50_ms', 'p95_ms', 'p99_ms', 'queries', 'peak_memory_kb']
+
+
+def seed(services=10, parameters=5, orders=1000, users=10):
+    """Create services, parameters, orders and users for a benchmark run."""
+    staff = [
+        User(username=f'bench_staff_{q}', is_staff=True)
+        for q in range(max(users // 2, 1))]
+    customers = [
+        User(username=f'bench_customer_{q}')
+        for q in range(max(users - len(staff), 1))]
+    User.objects.bulk_create(staff + customers)
+
+    Service.objects.bulk_create(
+        Service(title=f'Услуга {q}') for q in range(services))
+    Parameter.objects.bulk_create(
+        Parameter(title=f'Параметр {q}') for q in range(parameters))
+    service_objects = list(Service.objects.all())
+    parameter_objects = list(Parameter.objects.all())
+    ParameterInService.objects.bulk_create(
+        ParameterInService(service=service, parameter=parameter, type='text')
+        for service in service_objects for parameter in parameter_objects)
+
+    snapshot = build_parameters_snapshot(
+        (parameter.title, 'значение') for parameter in parameter_objects)
+    for start in range(0, orders, SEED_BATCH_SIZE):
+        Order.objects.bulk_create(
+            Order(
+                service=service_objects[q % len(service_objects)],
+                parameters_snapshot=snapshot,
+            )
+            for q in range(start, min(start + SEED_BATCH_SIZE, orders)))
+    order_ids = list(Order.objects.order_by('id').values_list('id', flat=True))
+    for start in range(0, len(order_ids), SEED_BATCH_SIZE):
+        ParameterInOrder.objects.bulk_create(
+            ParameterInOrder(
+                order_id=order_id, parameter=parameter, value='значение')
+            for order_id in order_ids[start:start + SEED_BATCH_SIZE]
+            for parameter in parameter_objects)
+
+    return {
+        'staff': User.objects.filter(is_staff=True).first(),
+        'customer': User.objects.filter(is_staff=False).first(),
+        'service': service_objects[0],
+        'parameters': parameter_objects,
+        'order_ids': order_ids,
+    }
+
+
+def service_list(clients, data, iteration):
+    return clients['customer'].get(reverse('orders:service_list'))
+
+
+def order_create(clients, data, iteration):
+    payload = {
+        'service': data['service'].id,
+        'parameters_quantity': len(data['parameters']),
+    }
+    for q, parameter in enumerate(data['parameters']):
+        payload[f'parameter_title_{q}'] = parameter.title
+        payload[f'parameter_value_{q}'] = f'значение {iteration}'
+    return clients['customer'].post(
+        reverse('orders:order_create',
+                kwargs={'service_id': data['service'].id}),
+        payload)
+
+
+def order_list(clients, data, iteration):
+    return clients['staff'].get(reverse('orders:order_list'))
+
+
+def order_detail(clients, data, iteration):
+    order_id = data['order_ids'][iteration % len(data['order_ids'])]
+    return clients['staff'].get(
+        reverse('orders:order_detail', kwargs={'pk': order_id}))
+
+
+def order_complete(clients, data, iteration):
+    order_id = data['order_ids'][-(iteration % len(data['order_ids'])) - 1]
+    return clients['staff'].post(
+        reverse('orders:order_complete', kwargs={'pk': order_id}))
+
+
+def api_order_list(clients, data, iteration):
+    return clients['staff'].get(reverse('api:orders-list'))
+
+
+def api_order_batch(clients, data, iteration):
+    order = {
+        'service': data['service'].id,
+        'parameters': [
+            {'parameter': parameter.title, 'value': f'значение {iteration}'}
+            for parameter in data['parameters']],
+    }
+    return clients['customer'].post(
+        reverse('api:order-batches-list'),
+        {'orders': [order] * INTAKE_BATCH_ORDERS},
+        content_type='application/json')
+
+
+ENDPOINTS = {
+    'service_list': service_list,
+    'order_create': order_create,
+    'order_list': order_list,
+    'order_detail': order_detail,
+    'order_complete': order_complete,
+    'api_order_list': api_order_list,
+    'api_order_batch': api_order_batch,
+}
+
+
+def percentile(values, percent):
+    """Return the nearest-rank percentile of the values."""
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def measure(request, clients, data, iterations):
+    """Run a request repeatedly and collect latency, queries and memory."""
+    latencies = []
+    for iteration in range(iterations):
+        started = time.perf_counter()
+        response = request(clients, data, iteration)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    # Queries and memory are measured on a separate run, tracing memory
+    # would distort the latencies.
+    tracemalloc.start()
+    try:
+        with CaptureQueriesContext(connection) as context:
+            response = request(clients, data, iterations)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'status': response.status_code,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'queries': len(context.captured_queries),
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+
+
+def run_benchmark(data, iterations=50, endpoints=None):
+    """Measure every endpoint against already seeded data."""
+    clients = {'staff': Client(), 'customer': Client()}
+    clients['staff'].force_login(data['staff'])
+    clients['customer'].force_login(data['customer'])
+    return {
+        name: measure(ENDPOINTS[name], clients, data, iterations)
+        for name in endpoints or ENDPOINTS
+    }
+
+
+def compare(report, baseline, threshold=1.2):
+    """Return metrics of the report that grew over the baseline.
+
+    Each item is ``(endpoint, metric, baseline value, current value)``.
+    """
+    regressions = []
+    for name, metrics in report['endpoints'].items():
+        previous = baseline.get('endpoints', {}).get(name)
+        if previous is None:
+            continue
+        for metric in BENCHMARK_METRICS:
+            if metrics[metric] > previous[metric] * threshold:
+                regressions.append(
+                    (name, metric, previous[metric], metrics[metric]))
+    return regressions
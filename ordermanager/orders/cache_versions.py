@@ -0,0 +1,40 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+def new_version():
+    """Return a version to start a counter from.
+
+    It is the current time, so that a counter lost on cache eviction never
+    starts over with a version already used for cached data.
+    """
+    return time.time_ns() // 1000
+
+
+def get_version(key):
+    """Return the counter under the key, starting it if it is missing."""
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, new_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    """Increment the counter under the key, restart it if it is missing."""
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, new_version(), None)
+
+
+def bump_version_on_commit(key, using=None):
+    """Increment the counter now and once the current transaction commits.
+
+    Data another request caches before the commit is read without the
+    change, the second increment keeps it from being used afterwards.
+    """
+    bump_version(key)
+    transaction.on_commit(lambda: bump_version(key), using=using)
@@ -0,0 +1,96 @@
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from .cache_versions import bump_version_on_commit, get_version
+from .models import ParameterInService, Service
+
+# Everything cached under the catalog version is read from the primary, a
+# lagging replica would store old services under the new version.
+CATALOG_VERSION_KEY = 'orders:catalog_version'
+SERVICE_SCHEMA_KEY = 'orders:service_schema:{version}:{service_id}'
+SERVICE_TITLES_KEY = 'orders:service_titles:{version}'
+SERVICE_CATALOG_KEY = 'orders:service_catalog:{version}'
+SERVICE_SCHEMA_TIMEOUT = 60 * 60
+
+
+def get_catalog_version():
+    """Return the current version of services and their parameters."""
+    return get_version(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version(using=None):
+    """Invalidate everything cached for the current catalog version.
+
+    The version is bumped again once the current transaction commits, so
+    a catalog another request caches before the commit is not kept.
+    """
+    bump_version_on_commit(CATALOG_VERSION_KEY, using)
+
+
+def get_service_schema(service_id):
+    """Return parameters of a service keyed by parameter title.
+
+    Each value is a dict with ``parameter_id`` and ``type`` of the
+    parameter, in the order the parameters are shown in the order form.
+    """
+    key = SERVICE_SCHEMA_KEY.format(
+        version=get_catalog_version(), service_id=service_id)
+    schema = cache.get(key)
+    if schema is None:
+        schema = load_service_schema(service_id)
+        cache.set(key, schema, SERVICE_SCHEMA_TIMEOUT)
+    return schema
+
+
+def load_service_schema(service_id):
+    """Read the schema of ``get_service_schema`` from the database."""
+    return {
+        item.parameter.title: {
+            'parameter_id': item.parameter_id,
+            'type': item.type,
+        }
+        for item in ParameterInService.objects.using(
+            DEFAULT_DB_ALIAS).filter(
+            service_id=service_id).select_related('parameter')
+    }
+
+
+def get_service_titles():
+    """Return titles of all services keyed by service id."""
+    key = SERVICE_TITLES_KEY.format(version=get_catalog_version())
+    titles = cache.get(key)
+    if titles is None:
+        titles = dict(Service.objects.using(DEFAULT_DB_ALIAS).values_list(
+            'id', 'title'))
+        cache.set(key, titles, SERVICE_SCHEMA_TIMEOUT)
+    return titles
+
+
+def get_service_catalog(version=None):
+    """Return all services with the parameters of their order forms.
+
+    Each service is a dict with ``id``, ``title`` and ``parameters``, a
+    list of dicts with the ``parameter`` title and its ``type`` in the
+    order the parameters are shown in the order form. Pass the catalog
+    version already used for an ETag to get the matching catalog.
+    """
+    key = SERVICE_CATALOG_KEY.format(version=version or get_catalog_version())
+    catalog = cache.get(key)
+    if catalog is None:
+        parameters = defaultdict(list)
+        for item in ParameterInService.objects.using(
+                DEFAULT_DB_ALIAS).select_related('parameter'):
+            parameters[item.service_id].append(
+                {'parameter': item.parameter.title, 'type': item.type})
+        catalog = [
+            {
+                'id': service.id,
+                'title': service.title,
+                'parameters': parameters[service.id],
+            }
+            for service in Service.objects.using(DEFAULT_DB_ALIAS)
+        ]
+        cache.set(key, catalog, SERVICE_SCHEMA_TIMEOUT)
+    return catalog
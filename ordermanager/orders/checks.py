@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+CACHED_SESSION_ENGINES = [
+    'django.contrib.sessions.backends.cache',
+    'django.contrib.sessions.backends.cached_db',
+]
+
+
+def is_shared_cache():
+    """Return whether every process of the deployment sees the cache."""
+    return (
+        settings.CACHES['default']['BACKEND']
+        not in settings.PROCESS_LOCAL_CACHES)
+
+
+@register()
+def check_shared_cache(app_configs, **kwargs):
+    """Warn about settings that need a cache shared by all processes."""
+    if is_shared_cache():
+        return []
+    warnings = []
+    if settings.SESSION_ENGINE in CACHED_SESSION_ENGINES:
+        warnings.append(Warning(
+            'Сессии хранятся в кэше отдельного процесса.',
+            hint='Задайте общий кэш (CACHE_BACKEND, CACHE_LOCATION) или '
+                 'SESSION_ENGINE=django.contrib.sessions.backends.db.',
+            id='orders.W001',
+        ))
+    if 'orders.backends.CachedModelBackend' in (
+            settings.AUTHENTICATION_BACKENDS):
+        warnings.append(Warning(
+            'Пользователи хранятся в кэше отдельного процесса.',
+            hint='Задайте общий кэш (CACHE_BACKEND, CACHE_LOCATION) или '
+                 'AUTHENTICATION_BACKEND='
+                 'django.contrib.auth.backends.ModelBackend.',
+            id='orders.W002',
+        ))
+    if getattr(settings, 'ORDER_LIST_MODE', 'database') == 'materialized':
+        warnings.append(Warning(
+            'Открытые заказы хранятся в кэше отдельного процесса.',
+            hint='Задайте общий кэш (CACHE_BACKEND, CACHE_LOCATION) или '
+                 'ORDER_LIST_MODE=database.',
+            id='orders.W003',
+        ))
+    return warnings
@@ -0,0 +1,158 @@
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+ORDER_EVENTS_CHANNEL = 'order_events'
+SUBSCRIBER_QUEUE_SIZE = 100
+LISTENER_POLL_TIMEOUT = 5
+LISTENER_RETRY_DELAY = 1
+# PostgreSQL rejects NOTIFY payloads of 8000 bytes and more.
+NOTIFY_PAYLOAD_LIMIT = 7000
+
+
+class InProcessBroker:
+    """Fan out order events to subscribers living in this process.
+
+    Subscribers are asyncio queues bound to their event loop, ``publish``
+    may be called from any thread. A subscriber that does not keep up loses
+    events instead of slowing everybody else down.
+    """
+
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        subscription = (
+            asyncio.get_running_loop(),
+            asyncio.Queue(SUBSCRIBER_QUEUE_SIZE),
+        )
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._put, queue, event)
+            except RuntimeError:
+                self.unsubscribe((loop, queue))
+
+    @staticmethod
+    def _put(queue, event):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            pass
+
+
+class PostgresListener(threading.Thread):
+    """Forward ``NOTIFY`` payloads of the order channel to the broker.
+
+    One listener per process is enough: every notification is delivered
+    once to the process and then fanned out to its subscribers in memory.
+    """
+
+    def __init__(self, broker, connection_params):
+        super().__init__(name='order-events-listener', daemon=True)
+        self.broker = broker
+        self.connection_params = connection_params
+
+    def run(self):
+        while True:
+            try:
+                self.listen()
+            except Exception:
+                logger.exception('Order events listener failed, restarting')
+                time.sleep(LISTENER_RETRY_DELAY)
+
+    def listen(self):
+        import psycopg2
+
+        pg_connection = psycopg2.connect(**self.connection_params)
+        pg_connection.set_isolation_level(
+            psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        try:
+            with pg_connection.cursor() as cursor:
+                cursor.execute(f'LISTEN {ORDER_EVENTS_CHANNEL}')
+            while True:
+                if not select.select(
+                        [pg_connection], [], [], LISTENER_POLL_TIMEOUT)[0]:
+                    continue
+                pg_connection.poll()
+                while pg_connection.notifies:
+                    notify = pg_connection.notifies.pop(0)
+                    self.broker.publish(json.loads(notify.payload))
+        finally:
+            pg_connection.close()
+
+
+broker = InProcessBroker()
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def uses_notify():
+    return connection.vendor == 'postgresql'
+
+
+def ensure_listener():
+    """Start the ``LISTEN`` thread of this process if the backend has one."""
+    global _listener
+    if not uses_notify():
+        return
+    with _listener_lock:
+        if _listener is None:
+            _listener = PostgresListener(
+                broker, connection.get_connection_params())
+            _listener.start()
+
+
+def publish_event(payload):
+    """Announce an event once the current transaction commits."""
+    if uses_notify():
+        # NOTIFY is transactional itself and reaches every process.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT pg_notify(%s, %s)',
+                [ORDER_EVENTS_CHANNEL, json.dumps(payload)],
+            )
+    else:
+        transaction.on_commit(lambda: broker.publish(payload))
+
+
+def publish_order_event(event, order_id, **data):
+    """Announce an event of one order once the transaction commits."""
+    publish_event(dict(data, event=event, id=order_id))
+
+
+def publish_orders_event(event, field, items):
+    """Announce an event of many orders with as few events as possible.
+
+    ``items`` are put in the ``field`` list of the payload. They are split
+    into several events only where a payload would not fit into a
+    ``NOTIFY``.
+    """
+    batch, size = [], 0
+    for item in items:
+        item_size = len(json.dumps(item)) + 2
+        if batch and size + item_size > NOTIFY_PAYLOAD_LIMIT:
+            publish_event({'event': event, field: batch})
+            batch, size = [], 0
+        batch.append(item)
+        size += item_size
+    if batch:
+        publish_event({'event': event, field: batch})
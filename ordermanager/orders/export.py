@@ -0,0 +1,98 @@
+import csv
+import heapq
+import json
+from collections import defaultdict
+from itertools import islice
+from operator import itemgetter
+
+from .models import ArchivedOrder, Order
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FIELDS = [
+    'id', 'service', 'author', 'performer', 'complete', 'time_created',
+    'parameters',
+]
+
+
+def get_export_querysets(
+        service=None, complete=None, created_after=None, created_before=None):
+    """Return orders and archived orders matching the export filters."""
+    querysets = []
+    for queryset in [Order.objects.all(), ArchivedOrder.objects.all()]:
+        if service is not None:
+            queryset = queryset.filter(service=service)
+        if complete is not None:
+            queryset = queryset.filter(complete=complete)
+        if created_after is not None:
+            queryset = queryset.filter(time_created__gte=created_after)
+        if created_before is not None:
+            queryset = queryset.filter(time_created__lt=created_before)
+        querysets.append(queryset)
+    return querysets
+
+
+def iter_export_rows(querysets, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield rows of all querysets merged in the order of ids."""
+    return heapq.merge(
+        *(iter_order_rows(queryset, chunk_size) for queryset in querysets),
+        key=itemgetter('id'))
+
+
+def iter_order_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield orders with their parameters as dicts.
+
+    Orders are read through a server-side cursor where the backend has one,
+    and parameters are loaded with one query per chunk of orders, so memory
+    use does not depend on the number of exported orders.
+    """
+    parameters_model = queryset.model._meta.get_field(
+        'parameters_assigned').related_model
+    orders = queryset.order_by('id').values_list(
+        'id', 'service__title', 'author__username', 'performer__username',
+        'complete', 'time_created',
+    ).iterator(chunk_size=chunk_size)
+
+    while True:
+        chunk = list(islice(orders, chunk_size))
+        if not chunk:
+            return
+
+        parameters = defaultdict(list)
+        for order_id, title, value in parameters_model.objects.filter(
+            order_id__in=[row[0] for row in chunk],
+        ).order_by('order_id', 'id').values_list(
+            'order_id', 'parameter__title', 'value',
+        ):
+            parameters[order_id].append({'parameter': title, 'value': value})
+
+        for row in chunk:
+            order = dict(zip(EXPORT_FIELDS, row))
+            order['time_created'] = order['time_created'].isoformat()
+            order['parameters'] = parameters[order['id']]
+            yield order
+
+
+class Echo:
+    """File-like object that returns what is written to it."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows):
+    writer = csv.DictWriter(Echo(), fieldnames=EXPORT_FIELDS)
+    yield writer.writeheader()
+    for row in rows:
+        row['parameters'] = json.dumps(row['parameters'], ensure_ascii=False)
+        yield writer.writerow(row)
+
+
+def iter_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+EXPORT_FORMATS = {
+    'csv': (iter_csv, 'text/csv'),
+    'ndjson': (iter_ndjson, 'application/x-ndjson'),
+}
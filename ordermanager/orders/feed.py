@@ -0,0 +1,91 @@
+import asyncio
+import json
+from http.cookies import SimpleCookie
+from importlib import import_module
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import auth
+from django.db import close_old_connections
+from django.http import HttpRequest
+
+from .events import broker, ensure_listener
+
+ORDER_FEED_PATH = '/orders/feed/'
+KEEPALIVE_INTERVAL = 15
+
+
+@sync_to_async
+def get_user(scope):
+    """Resolve the user of the session cookie sent with the request."""
+    cookies = SimpleCookie()
+    for name, value in scope.get('headers', []):
+        if name == b'cookie':
+            cookies.load(value.decode('latin1'))
+    session_key = cookies.get(settings.SESSION_COOKIE_NAME)
+
+    request = HttpRequest()
+    engine = import_module(settings.SESSION_ENGINE)
+    request.session = engine.SessionStore(
+        session_key.value if session_key else None)
+    try:
+        return auth.get_user(request)
+    finally:
+        close_old_connections()
+
+
+async def send_response_start(send, status, content_type):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', content_type),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ],
+    })
+
+
+async def wait_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def order_feed(scope, receive, send):
+    """Stream order events to staff as Server-Sent Events."""
+    user = await get_user(scope)
+    if not (user.is_superuser or user.is_staff):
+        await send_response_start(send, 403, b'text/plain; charset=utf-8')
+        await send({'type': 'http.response.body', 'body': b'Forbidden'})
+        return
+
+    await sync_to_async(ensure_listener)()
+    subscription = broker.subscribe()
+    queue = subscription[1]
+    disconnect = asyncio.ensure_future(wait_disconnect(receive))
+    try:
+        await send_response_start(send, 200, b'text/event-stream')
+        while True:
+            event = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait(
+                {event, disconnect}, timeout=KEEPALIVE_INTERVAL,
+                return_when=asyncio.FIRST_COMPLETED)
+            if disconnect in done:
+                event.cancel()
+                break
+            if event in done:
+                payload = event.result()
+                body = (
+                    f"event: {payload['event']}\n"
+                    f'data: {json.dumps(payload, ensure_ascii=False)}\n\n')
+            else:
+                event.cancel()
+                body = ': keepalive\n\n'
+            await send({
+                'type': 'http.response.body',
+                'body': body.encode(),
+                'more_body': True,
+            })
+    finally:
+        disconnect.cancel()
+        broker.unsubscribe(subscription)
@@ -1,8 +1,12 @@
 from django import forms
 from django.db import transaction
-from django.shortcuts import get_object_or_404
 
-from .models import Order, ParameterInOrder, Parameter
+from .catalog import get_service_schema
+from .export import EXPORT_FORMATS
+from .models import (
+    PARAMETER_VALUE_ERRORS, Order, ParameterInOrder, Service,
+    build_parameters_snapshot, convert_parameter_value,
+)
 
 
 class OrderCreateForm(forms.ModelForm):
@@ -12,9 +16,10 @@ class OrderCreateForm(forms.ModelForm):
 
     def __init__(self, data=None, **kwargs):
         self.parameters = None
+        self.parameters_in_service = dict()
+        self.schema = dict()
 
         if data is not None:
-            self.parameters_in_service = dict()
             for q in range(int(data.get('parameters_quantity', 0))):
                 title = data[f'parameter_title_{q}']
                 value = data[f'parameter_value_{q}']
@@ -22,18 +27,45 @@ class OrderCreateForm(forms.ModelForm):
 
         super().__init__(data=data, **kwargs)
 
+    def clean(self):
+        cleaned_data = super().clean()
+        service = cleaned_data.get('service')
+        if service is not None:
+            self.schema = get_service_schema(service.id)
+            unknown = [
+                title for title in self.parameters_in_service
+                if title not in self.schema]
+            if unknown:
+                raise forms.ValidationError(
+                    'Параметры не заданы для услуги: %(titles)s',
+                    code='unknown_parameters',
+                    params={'titles': ', '.join(unknown)},
+                )
+            for title, value in self.parameters_in_service.items():
+                type = self.schema[title]['type']
+                try:
+                    convert_parameter_value(type, value)
+                except ValueError:
+                    self.add_error(None, PARAMETER_VALUE_ERRORS[type].format(
+                        title=title))
+        return cleaned_data
+
     @transaction.atomic
     def save(self, commit=True):
         order = super().save(commit=False)
+        order.parameters_snapshot = build_parameters_snapshot(
+            self.parameters_in_service.items())
         order.save()
 
-        parameters_in_order = []
-        for title, value in self.parameters_in_service.items():
-            parameter = get_object_or_404(Parameter, title=title)
-            parameters_in_order.append(
-                ParameterInOrder(
-                    order=order, parameter=parameter, value=value))
-        ParameterInOrder.objects.bulk_create(parameters_in_order)
+        ParameterInOrder.objects.bulk_create(
+            ParameterInOrder(
+                order=order,
+                parameter_id=self.schema[title]['parameter_id'],
+                value=value,
+                **convert_parameter_value(self.schema[title]['type'], value),
+            )
+            for title, value in self.parameters_in_service.items()
+        )
 
         self.save_m2m()
         return order
@@ -43,3 +75,15 @@ class OrderCompleteForm(forms.ModelForm):
     class Meta:
         fields = ['performer', 'complete']
         model = Order
+
+
+class OrderExportForm(forms.Form):
+    format = forms.ChoiceField(
+        choices=[(name, name) for name in EXPORT_FORMATS], required=False)
+    service = forms.ModelChoiceField(Service.objects.all(), required=False)
+    complete = forms.NullBooleanField(required=False)
+    created_after = forms.DateTimeField(required=False)
+    created_before = forms.DateTimeField(required=False)
+
+    def clean_format(self):
+        return self.cleaned_data['format'] or 'csv'
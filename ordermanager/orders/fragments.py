@@ -0,0 +1,18 @@
+from .cache_versions import bump_version_on_commit, get_version
+
+ORDER_LIST_VERSION_KEY = 'orders:order_list_version'
+FRAGMENT_CACHE_TIMEOUT = 60 * 60
+
+
+def get_order_list_version():
+    """Return the version of cached order list fragments."""
+    return get_version(ORDER_LIST_VERSION_KEY)
+
+
+def bump_order_list_version(using=None):
+    """Invalidate cached order list fragments.
+
+    The version is bumped again once the current transaction commits, so
+    a list another request renders before the commit is not kept.
+    """
+    bump_version_on_commit(ORDER_LIST_VERSION_KEY, using)
@@ -0,0 +1,272 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, models, transaction
+from django.utils import timezone
+
+from .catalog import get_service_schema, load_service_schema
+from .events import publish_orders_event
+from .fragments import bump_order_list_version
+from .models import (
+    PARAMETER_VALUE_ERRORS, Order, OrderCounter, OrderIntake,
+    ParameterInOrder, Service, build_parameters_snapshot,
+    convert_parameter_value,
+)
+from .open_orders import record_open_orders
+
+INTAKE_BATCH_SIZE = 1000
+INTAKE_MAX_PENDING = 10000
+INTAKE_DEPTH_KEY = 'orders:intake:depth'
+INTAKE_DEPTH_TIMEOUT = 5
+INTAKE_STATS_WINDOW = timedelta(hours=1)
+
+
+class IntakeQueueFull(Exception):
+    """Raised when too many orders are waiting to be flushed."""
+
+
+def is_buffered():
+    return getattr(settings, 'ORDER_INTAKE_MODE', 'direct') == 'buffered'
+
+
+def get_service_schemas(items, get_schema=None):
+    """Return schemas of the existing services of a batch by service id.
+
+    Schemas are read from the cache unless another ``get_schema`` is given.
+    """
+    get_schema = get_schema or get_service_schema
+    service_ids = {item['service'] for item in items}
+    return {
+        service_id: get_schema(service_id)
+        for service_id in Service.objects.filter(
+            id__in=service_ids).values_list('id', flat=True)}
+
+
+def validate_orders(items, schemas=None):
+    """Check a batch of orders against the parameters of their services.
+
+    ``items`` are dicts with a ``service`` id and ``parameters``, a list of
+    ``(title, value)`` pairs. Return a list of error messages per item,
+    empty for valid items. Services and their schemas are loaded once per
+    batch, not per order, unless ``schemas`` of ``get_service_schemas``
+    are given.
+    """
+    if schemas is None:
+        schemas = get_service_schemas(items)
+
+    errors = []
+    for item in items:
+        item_errors = []
+        schema = schemas.get(item['service'])
+        if schema is None:
+            errors.append(['Услуга не найдена.'])
+            continue
+
+        titles = Counter(title for title, _ in item['parameters'])
+        unknown = [title for title in titles if title not in schema]
+        if unknown:
+            item_errors.append(
+                'Параметры не заданы для услуги: ' + ', '.join(unknown))
+        repeated = [title for title, count in titles.items() if count > 1]
+        if repeated:
+            item_errors.append(
+                'Параметры указаны несколько раз: ' + ', '.join(repeated))
+        for title, value in item['parameters']:
+            type = schema.get(title, {}).get('type')
+            try:
+                convert_parameter_value(type, value)
+            except ValueError:
+                item_errors.append(
+                    PARAMETER_VALUE_ERRORS[type].format(title=title))
+        errors.append(item_errors)
+    return errors
+
+
+@transaction.atomic
+def create_orders(items):
+    """Create a batch of orders with their parameters.
+
+    ``items`` are dicts like those of ``validate_orders`` with the
+    ``author_id`` of each order added. They are validated again against
+    the schemas read from the database in the transaction, since services
+    could have changed after the orders were checked. Return a list of the
+    created order or ``None`` per item and a list of errors per item.
+
+    Orders and parameters are written with bulk inserts in one transaction.
+    Backends that cannot return ids from a bulk insert get orders inserted
+    one by one as raw saves, which the counting and announcing receivers
+    skip, so that both are still done per batch.
+    """
+    schemas = get_service_schemas(items, load_service_schema)
+    errors = validate_orders(items, schemas)
+    valid = [
+        item for item, item_errors in zip(items, errors) if not item_errors]
+    if not valid:
+        return [None] * len(items), errors
+
+    now = timezone.now()
+    services = Service.objects.in_bulk({item['service'] for item in valid})
+    orders = [
+        Order(
+            author_id=item['author_id'],
+            service=services[item['service']],
+            time_created=now,
+            time_updated=now,
+            parameters_snapshot=build_parameters_snapshot(item['parameters']),
+        )
+        for item in valid
+    ]
+
+    features = connections[Order.objects.db].features
+    if features.can_return_rows_from_bulk_insert:
+        Order.objects.bulk_create(orders, batch_size=INTAKE_BATCH_SIZE)
+    else:
+        for order in orders:
+            order.save_base(raw=True)
+
+    per_service = Counter(order.service_id for order in orders)
+    for service_id, created in per_service.items():
+        OrderCounter.objects.increment(service_id, now, created=created)
+    publish_orders_event('orders_created', 'orders', [
+        {'id': order.id, 'title': str(order)} for order in orders])
+    bump_order_list_version()
+    record_open_orders(added=orders)
+
+    parameters = []
+    for order, item in zip(orders, valid):
+        schema = schemas[order.service_id]
+        parameters.extend(
+            ParameterInOrder(
+                order=order,
+                parameter_id=schema[title]['parameter_id'],
+                value=value,
+                **convert_parameter_value(schema[title]['type'], value),
+            )
+            for title, value in item['parameters'])
+    ParameterInOrder.objects.bulk_create(
+        parameters, batch_size=INTAKE_BATCH_SIZE)
+
+    created = iter(orders)
+    return [
+        None if item_errors else next(created) for item_errors in errors
+    ], errors
+
+
+def get_pending_depth():
+    """Return the number of queued orders, cached for a few seconds.
+
+    The depth is counted at most once per ``INTAKE_DEPTH_TIMEOUT`` and
+    kept up to date in between by enqueued and flushed orders, so that it
+    is only approximate.
+    """
+    depth = cache.get(INTAKE_DEPTH_KEY)
+    if depth is None:
+        depth = OrderIntake.objects.filter(time_flushed__isnull=True).count()
+        cache.set(INTAKE_DEPTH_KEY, depth, INTAKE_DEPTH_TIMEOUT)
+    return depth
+
+
+def change_pending_depth(delta):
+    try:
+        cache.incr(INTAKE_DEPTH_KEY, delta)
+    except ValueError:
+        # Not counted yet or expired, the next check counts again.
+        pass
+
+
+def enqueue_order(author, service, parameters):
+    """Queue an order for the flusher instead of creating it right away.
+
+    Raise ``IntakeQueueFull`` when about ``ORDER_INTAKE_MAX_PENDING``
+    orders are already waiting, so that a stalled flusher does not let the
+    queue grow without bound.
+    """
+    limit = getattr(settings, 'ORDER_INTAKE_MAX_PENDING', INTAKE_MAX_PENDING)
+    if get_pending_depth() >= limit:
+        raise IntakeQueueFull
+    intake = OrderIntake.objects.create(
+        author=author, service=service, parameters=list(parameters))
+    change_pending_depth(1)
+    return intake
+
+
+def flush_intake_batch(batch_size=INTAKE_BATCH_SIZE):
+    """Create orders for a batch of queued ones, return the batch size.
+
+    Orders are validated again, since the services could have changed
+    while they were queued, and queued orders that fail are kept with the
+    errors. Several flushers can run at once on backends with
+    ``SKIP LOCKED``.
+    """
+    with transaction.atomic():
+        pending = OrderIntake.objects.filter(
+            time_flushed__isnull=True).order_by('id')
+        if connections[pending.db].features.has_select_for_update_skip_locked:
+            pending = pending.select_for_update(skip_locked=True)
+        intakes = list(pending[:batch_size])
+        if not intakes:
+            return 0
+
+        items = [
+            {
+                'author_id': intake.author_id,
+                'service': intake.service_id,
+                'parameters': [tuple(pair) for pair in intake.parameters],
+            }
+            for intake in intakes
+        ]
+        orders, errors = create_orders(items)
+
+        now = timezone.now()
+        for intake, order, item_errors in zip(intakes, orders, errors):
+            intake.order = order
+            intake.time_flushed = now
+            intake.error = '\n'.join(item_errors)
+        OrderIntake.objects.bulk_update(
+            intakes, ['order', 'time_flushed', 'error'])
+    change_pending_depth(-len(intakes))
+    return len(intakes)
+
+
+def purge_flushed_intakes(flushed_before):
+    """Delete queued orders flushed before the given time."""
+    deleted, _ = OrderIntake.objects.filter(
+        time_flushed__lt=flushed_before).delete()
+    return deleted
+
+
+def get_intake_stats():
+    """Return the queue depth and flush latency of the buffered intake.
+
+    Latency is the time between accepting an order and creating it,
+    averaged over orders flushed within ``INTAKE_STATS_WINDOW``.
+    """
+    now = timezone.now()
+    pending = OrderIntake.objects.filter(
+        time_flushed__isnull=True).aggregate(
+        depth=models.Count('id'), oldest=models.Min('time_received'))
+    latency = models.ExpressionWrapper(
+        models.F('time_flushed') - models.F('time_received'),
+        output_field=models.DurationField())
+    flushed = OrderIntake.objects.filter(
+        time_flushed__gte=now - INTAKE_STATS_WINDOW).aggregate(
+        flushed=models.Count('id'),
+        failed=models.Count('id', filter=~models.Q(error='')),
+        average_latency=models.Avg(latency),
+        max_latency=models.Max(latency))
+    return {
+        'pending': pending['depth'],
+        'oldest_pending_seconds': (
+            (now - pending['oldest']).total_seconds()
+            if pending['oldest'] else 0),
+        'flushed': flushed['flushed'],
+        'failed': flushed['failed'],
+        'average_latency_seconds': (
+            flushed['average_latency'].total_seconds()
+            if flushed['average_latency'] else 0),
+        'max_latency_seconds': (
+            flushed['max_latency'].total_seconds()
+            if flushed['max_latency'] else 0),
+    }
@@ -0,0 +1,40 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from orders.archive import ARCHIVE_BATCH_SIZE, archive_batch
+
+
+class Command(BaseCommand):
+    help = (
+        'Перенести выполненные заказы старше заданного числа дней в архив. '
+        'Каждая порция переносится в отдельной транзакции, поэтому прерванный '
+        'перенос можно просто запустить заново.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30)
+        parser.add_argument(
+            '--batch-size', type=int, default=ARCHIVE_BATCH_SIZE)
+        parser.add_argument(
+            '--max-batches', type=int,
+            help='Остановиться после заданного числа порций')
+        parser.add_argument(
+            '--pause', type=float, default=0,
+            help='Пауза между порциями в секундах')
+
+    def handle(self, *args, **options):
+        completed_before = timezone.now() - timedelta(days=options['days'])
+        batches = archived = 0
+        while options['max_batches'] is None or (
+                batches < options['max_batches']):
+            count = archive_batch(completed_before, options['batch_size'])
+            if not count:
+                break
+            batches += 1
+            archived += count
+            self.stdout.write(f'Перенесено в архив: {archived}')
+            time.sleep(options['pause'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово, перенесено заказов: {archived}'))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from orders.models import ArchivedOrder, Order
+from orders.snapshots import SNAPSHOT_BATCH_SIZE, backfill_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Заполнить копию параметров у заказов, где её ещё нет.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=SNAPSHOT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        for model in [Order, ArchivedOrder]:
+            filled = 0
+            for count in backfill_snapshots(model, options['batch_size']):
+                filled += count
+                self.stdout.write(
+                    f'{model._meta.verbose_name_plural}: {filled}')
+            self.stdout.write(self.style.SUCCESS(
+                f'{model._meta.verbose_name_plural}, заполнено: {filled}'))
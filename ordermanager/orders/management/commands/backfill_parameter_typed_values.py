@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from orders.models import ArchivedParameterInOrder, ParameterInOrder
+from orders.snapshots import SNAPSHOT_BATCH_SIZE
+from orders.typed_values import backfill_typed_values
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполнить числовые и логические значения параметров заказов '
+        'по типам параметров в услугах. Каждая порция записывается '
+        'отдельным запросом, прерванный запуск можно повторить.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=SNAPSHOT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        for model in [ParameterInOrder, ArchivedParameterInOrder]:
+            checked = invalid = 0
+            for count, batch_invalid in backfill_typed_values(
+                    model, options['batch_size']):
+                checked += count
+                invalid += batch_invalid
+                self.stdout.write(
+                    f'{model._meta.verbose_name_plural}: {checked}')
+            self.stdout.write(self.style.SUCCESS(
+                f'{model._meta.verbose_name_plural}, проверено: {checked}, '
+                f'не соответствуют типу: {invalid}'))
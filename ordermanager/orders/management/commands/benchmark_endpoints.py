@@ -0,0 +1,79 @@
+import json
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    setup_test_environment, teardown_test_environment,
+)
+from django.utils import timezone
+
+from orders.benchmark import ENDPOINTS, compare, run_benchmark, seed
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполнить тестовую базу данных заданным объёмом данных и замерить '
+        'задержки (p50/p95/p99), число SQL-запросов и пиковую память '
+        'для каждой страницы. Рабочая база данных не затрагивается.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--services', type=int, default=10)
+        parser.add_argument('--parameters', type=int, default=5)
+        parser.add_argument('--orders', type=int, default=1000)
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument(
+            '--endpoint', action='append', choices=list(ENDPOINTS),
+            dest='endpoints', help='Замерять только указанные страницы')
+        parser.add_argument('--output', help='Файл для отчёта в JSON')
+        parser.add_argument(
+            '--baseline', help='Отчёт предыдущего запуска для сравнения')
+        parser.add_argument(
+            '--threshold', type=float, default=1.2,
+            help='Допустимый рост метрик относительно базового отчёта')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations должно быть не меньше 1.')
+        volumes = {
+            name: options[name]
+            for name in ['services', 'parameters', 'orders', 'users']}
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True)
+        try:
+            data = seed(**volumes)
+            endpoints = run_benchmark(
+                data, options['iterations'], options['endpoints'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        report = {
+            'meta': {
+                'timestamp': timezone.now().isoformat(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'iterations': options['iterations'],
+                'volumes': volumes,
+            },
+            'endpoints': endpoints,
+        }
+        content = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                output.write(content)
+        else:
+            self.stdout.write(content)
+
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as baseline:
+                regressions = compare(
+                    report, json.load(baseline), options['threshold'])
+            for name, metric, previous, current in regressions:
+                self.stderr.write(f'{name}.{metric}: {previous} -> {current}')
+            if regressions:
+                raise CommandError(
+                    f'Метрики ухудшились: {len(regressions)}')
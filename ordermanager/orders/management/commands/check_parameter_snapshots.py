@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from orders.fragments import bump_order_list_version
+from orders.models import ArchivedOrder, Order
+from orders.snapshots import SNAPSHOT_BATCH_SIZE, find_inconsistent_snapshots
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверить копии параметров заказов с таблицей параметров заказов '
+        'и при необходимости исправить расхождения.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=SNAPSHOT_BATCH_SIZE)
+        parser.add_argument(
+            '--fix', action='store_true',
+            help='Перезаписать расходящиеся копии')
+
+    def handle(self, *args, **options):
+        inconsistent = 0
+        for model in [Order, ArchivedOrder]:
+            for order in find_inconsistent_snapshots(
+                    model, options['batch_size']):
+                inconsistent += 1
+                self.stdout.write(f'Расхождение в заказе #{order.id}')
+                if options['fix']:
+                    # A new time_updated changes the order ETag and the
+                    # key of its cached page.
+                    model.objects.filter(pk=order.pk).update(
+                        parameters_snapshot=order.parameters_snapshot,
+                        time_updated=timezone.now())
+
+        if inconsistent and options['fix']:
+            bump_order_list_version()
+        if inconsistent and not options['fix']:
+            raise CommandError(f'Найдено расхождений: {inconsistent}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Сверка завершена, расхождений: {inconsistent}'))
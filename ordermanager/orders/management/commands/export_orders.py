@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.export import (
+    EXPORT_CHUNK_SIZE, EXPORT_FORMATS, get_export_querysets, iter_export_rows,
+)
+from orders.forms import OrderExportForm
+
+FILTER_OPTIONS = [
+    'format', 'service', 'complete', 'created_after', 'created_before']
+
+
+class Command(BaseCommand):
+    help = 'Выгрузить заказы с параметрами в формате CSV или NDJSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format', choices=list(EXPORT_FORMATS), default='csv')
+        parser.add_argument('--service', type=int, help='id услуги')
+        parser.add_argument('--complete', choices=['true', 'false'])
+        parser.add_argument(
+            '--created-after', help='Начало периода, ISO 8601')
+        parser.add_argument(
+            '--created-before', help='Конец периода (не включая), ISO 8601')
+        parser.add_argument(
+            '--chunk-size', type=int, default=EXPORT_CHUNK_SIZE)
+        parser.add_argument(
+            '--output', help='Файл для выгрузки, по умолчанию stdout')
+
+    def handle(self, *args, **options):
+        form = OrderExportForm({
+            name: options[name] for name in FILTER_OPTIONS
+            if options[name] is not None
+        })
+        if not form.is_valid():
+            raise CommandError(form.errors.as_text())
+
+        filters = dict(form.cleaned_data)
+        serialize, _ = EXPORT_FORMATS[filters.pop('format')]
+        rows = iter_export_rows(
+            get_export_querysets(**filters), options['chunk_size'])
+
+        if options['output'] is None:
+            for chunk in serialize(rows):
+                self.stdout.write(chunk, ending='')
+            return
+        with open(options['output'], 'w', encoding='utf-8',
+                  newline='') as output:
+            output.writelines(serialize(rows))
@@ -0,0 +1,65 @@
+import json
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from orders.intake import (
+    INTAKE_BATCH_SIZE, flush_intake_batch, get_intake_stats, is_buffered,
+    purge_flushed_intakes,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Создать заказы из очереди буферизованного приёма заказов '
+        'порциями. С --interval команда работает постоянно и проверяет '
+        'очередь с заданным интервалом.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=INTAKE_BATCH_SIZE)
+        parser.add_argument(
+            '--interval', type=float,
+            help='Интервал проверки пустой очереди в секундах')
+        parser.add_argument(
+            '--retention-hours', type=float, default=24,
+            help='Сколько часов хранить обработанные заявки')
+        parser.add_argument(
+            '--stats', action='store_true',
+            help='Вывести глубину очереди и задержку обработки в JSON')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.stdout.write(json.dumps(get_intake_stats(), indent=2))
+            return
+
+        while True:
+            flushed = self.flush(options['batch_size'])
+            purge_flushed_intakes(
+                timezone.now() - timedelta(hours=options['retention_hours']))
+            if options['interval'] is None:
+                break
+            if not is_buffered():
+                # Orders queued before switching modes are flushed above.
+                self.stdout.write(
+                    'Заказы создаются сразу (ORDER_INTAKE_MODE=direct), '
+                    'очередь проверять не нужно.')
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово, обработано заявок: {flushed}'))
+
+    def flush(self, batch_size):
+        """Flush the queue until it is empty, return the number of orders."""
+        flushed = 0
+        while True:
+            started = time.perf_counter()
+            count = flush_intake_batch(batch_size)
+            if not count:
+                return flushed
+            flushed += count
+            self.stdout.write(
+                f'Обработано заявок: {count} '
+                f'за {time.perf_counter() - started:.3f} с')
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from orders.models import OrderCounter
+
+
+class Command(BaseCommand):
+    help = 'Пересчитать счётчики заказов по таблицам заказов и архива.'
+
+    def handle(self, *args, **options):
+        buckets = OrderCounter.objects.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Счётчики пересчитаны, корзин: {buckets}'))
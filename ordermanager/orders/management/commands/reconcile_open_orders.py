@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.checks import is_shared_cache
+from orders.open_orders import is_materialized, reconcile_open_orders
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверить открытые заказы в кэше с базой данных и пересобрать их. '
+        'С --interval команда работает постоянно и выполняет сверку с '
+        'заданным интервалом.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, help='Интервал сверки в секундах')
+
+    def handle(self, *args, **options):
+        if not is_materialized():
+            self.stdout.write(
+                'Открытые заказы не хранятся в кэше '
+                '(ORDER_LIST_MODE=database), сверка не нужна.')
+            return
+        if not is_shared_cache():
+            raise CommandError(
+                'Для ORDER_LIST_MODE=materialized нужен общий кэш '
+                '(CACHE_BACKEND, CACHE_LOCATION).')
+        while True:
+            result = reconcile_open_orders()
+            self.stdout.write(
+                f'Открытых заказов: {result["open"]}, '
+                f'не хватало в кэше: {result["missing"]}, '
+                f'лишних в кэше: {result["extra"]}')
+            if options['interval'] is None:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,22 @@
+# Generated by Django 3.2 on 2026-10-18 15:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='complete',
+            field=models.BooleanField(default=False, verbose_name='Выполнено'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['complete', 'time_created', 'id'], name='order_complete_created_idx'),
+        ),
+    ]
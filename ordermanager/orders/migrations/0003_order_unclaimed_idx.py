@@ -0,0 +1,17 @@
+# Generated by Django 3.2 on 2026-10-18 15:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_order_complete_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('complete', False), ('performer__isnull', True)), fields=['time_created', 'id'], name='order_unclaimed_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 3.2 on 2026-10-18 15:32
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('orders', '0003_order_unclaimed_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('time_created', models.DateTimeField(db_index=True)),
+                ('complete', models.BooleanField(default=True, verbose_name='Выполнено')),
+                ('time_archived', models.DateTimeField(auto_now_add=True)),
+                ('author', models.ForeignKey(help_text='Автор заказа', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_orders_issued', to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('performer', models.ForeignKey(help_text='Исполнитель заказа', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_orders_performed', to=settings.AUTH_USER_MODEL, verbose_name='Исполнитель')),
+                ('service', models.ForeignKey(help_text='Заказываемая услуга', on_delete=django.db.models.deletion.CASCADE, related_name='archived_orders', to='orders.service', verbose_name='Услуга')),
+            ],
+            options={
+                'verbose_name': 'Архивный заказ',
+                'verbose_name_plural': 'Архивные заказы',
+                'ordering': ['time_created'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedParameterInOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.TextField(help_text='Значение параметра услуги в заказе', max_length=2000, verbose_name='Значение')),
+                ('order', models.ForeignKey(help_text='Заказ, в котором задан параметр услуги', on_delete=django.db.models.deletion.CASCADE, related_name='parameters_assigned', to='orders.archivedorder', verbose_name='Заказ')),
+                ('parameter', models.ForeignKey(help_text='Параметр услуги, который задан в заказе', on_delete=django.db.models.deletion.CASCADE, related_name='archived_orders_assigned', to='orders.parameter', verbose_name='Параметр')),
+            ],
+            options={
+                'verbose_name': 'Параметр услуги в архивном заказе',
+                'verbose_name_plural': 'Параметры услуг в архивных заказах',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='archivedparameterinorder',
+            constraint=models.UniqueConstraint(fields=('order', 'parameter'), name='unique_parameter_in_archived_order'),
+        ),
+    ]
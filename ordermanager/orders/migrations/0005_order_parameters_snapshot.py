@@ -0,0 +1,23 @@
+# Generated by Django 3.2 on 2026-10-18 15:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_archived_orders'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedorder',
+            name='parameters_snapshot',
+            field=models.JSONField(blank=True, editable=False, help_text='Копия параметров заказа для чтения без соединений', null=True, verbose_name='Параметры (копия)'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='parameters_snapshot',
+            field=models.JSONField(blank=True, editable=False, help_text='Копия параметров заказа для чтения без соединений', null=True, verbose_name='Параметры (копия)'),
+        ),
+    ]
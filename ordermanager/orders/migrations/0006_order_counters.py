@@ -0,0 +1,53 @@
+# Generated by Django 3.2 on 2026-10-18 15:35
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('orders', '0005_order_parameters_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedorder',
+            name='time_completed',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Время выполнения'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='time_completed',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Время выполнения'),
+        ),
+        migrations.CreateModel(
+            name='OrderCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField(verbose_name='Час')),
+                ('created', models.PositiveIntegerField(default=0, verbose_name='Создано заказов')),
+                ('completed', models.PositiveIntegerField(default=0, verbose_name='Выполнено заказов')),
+                ('performer', models.ForeignKey(db_constraint=False, help_text='Пусто для счётчика созданных заказов', null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='order_counters', to=settings.AUTH_USER_MODEL, verbose_name='Исполнитель')),
+                ('service', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='counters', to='orders.service', verbose_name='Услуга')),
+            ],
+            options={
+                'verbose_name': 'Счётчик заказов',
+                'verbose_name_plural': 'Счётчики заказов',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='ordercounter',
+            index=models.Index(fields=['hour'], name='order_counter_hour_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='ordercounter',
+            constraint=models.UniqueConstraint(condition=models.Q(performer__isnull=False), fields=('service', 'performer', 'hour'), name='unique_order_counter_performer'),
+        ),
+        migrations.AddConstraint(
+            model_name='ordercounter',
+            constraint=models.UniqueConstraint(condition=models.Q(performer__isnull=True), fields=('service', 'hour'), name='unique_order_counter_service'),
+        ),
+    ]
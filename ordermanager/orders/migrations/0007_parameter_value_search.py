@@ -0,0 +1,67 @@
+from django.db import migrations
+
+POSTGRESQL_FORWARD = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX parameterinorder_value_trgm_idx '
+    'ON orders_parameterinorder USING gin (UPPER(value) gin_trgm_ops)',
+]
+POSTGRESQL_BACKWARD = [
+    'DROP INDEX IF EXISTS parameterinorder_value_trgm_idx',
+]
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE orders_parameterinorder_fts USING fts5("
+    "value, content='orders_parameterinorder', content_rowid='id', "
+    "tokenize='trigram')",
+    'CREATE TRIGGER orders_parameterinorder_fts_insert '
+    'AFTER INSERT ON orders_parameterinorder BEGIN '
+    'INSERT INTO orders_parameterinorder_fts(rowid, value) '
+    'VALUES (new.id, new.value); END',
+    'CREATE TRIGGER orders_parameterinorder_fts_delete '
+    'AFTER DELETE ON orders_parameterinorder BEGIN '
+    'INSERT INTO orders_parameterinorder_fts'
+    '(orders_parameterinorder_fts, rowid, value) '
+    "VALUES ('delete', old.id, old.value); END",
+    'CREATE TRIGGER orders_parameterinorder_fts_update '
+    'AFTER UPDATE OF value ON orders_parameterinorder BEGIN '
+    'INSERT INTO orders_parameterinorder_fts'
+    '(orders_parameterinorder_fts, rowid, value) '
+    "VALUES ('delete', old.id, old.value); "
+    'INSERT INTO orders_parameterinorder_fts(rowid, value) '
+    'VALUES (new.id, new.value); END',
+    'INSERT INTO orders_parameterinorder_fts(orders_parameterinorder_fts) '
+    "VALUES ('rebuild')",
+]
+SQLITE_BACKWARD = [
+    'DROP TRIGGER IF EXISTS orders_parameterinorder_fts_insert',
+    'DROP TRIGGER IF EXISTS orders_parameterinorder_fts_delete',
+    'DROP TRIGGER IF EXISTS orders_parameterinorder_fts_update',
+    'DROP TABLE IF EXISTS orders_parameterinorder_fts',
+]
+
+
+def run_for_vendor(statements):
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_order_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_for_vendor({
+                'postgresql': POSTGRESQL_FORWARD,
+                'sqlite': SQLITE_FORWARD,
+            }),
+            run_for_vendor({
+                'postgresql': POSTGRESQL_BACKWARD,
+                'sqlite': SQLITE_BACKWARD,
+            }),
+        ),
+    ]
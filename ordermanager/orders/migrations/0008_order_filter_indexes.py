@@ -0,0 +1,21 @@
+# Generated by Django 3.2 on 2026-10-18 15:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0007_parameter_value_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['service', 'complete', 'time_created', 'id'], name='order_service_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['performer', 'complete', 'time_created', 'id'], name='order_performer_created_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+import django.utils.timezone
+
+
+def fill_time_updated(apps, schema_editor):
+    for name in ['Order', 'ArchivedOrder']:
+        apps.get_model('orders', name).objects.update(
+            time_updated=Coalesce('time_completed', 'time_created'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0008_order_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='time_updated',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Время изменения'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='archivedorder',
+            name='time_updated',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Время изменения'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_time_updated, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['complete', 'time_updated'], name='order_complete_updated_idx'),
+        ),
+    ]
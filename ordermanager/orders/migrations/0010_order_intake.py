@@ -0,0 +1,42 @@
+# Generated by Django 3.2 on 2026-10-18 15:49
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('orders', '0009_order_time_updated'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderIntake',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('parameters', models.JSONField(help_text='Пары названий и значений параметров заказа', verbose_name='Параметры')),
+                ('time_received', models.DateTimeField(auto_now_add=True, verbose_name='Время приёма')),
+                ('time_flushed', models.DateTimeField(blank=True, null=True, verbose_name='Время обработки')),
+                ('error', models.TextField(blank=True, help_text='Почему заказ не был создан', verbose_name='Ошибка')),
+                ('author', models.ForeignKey(help_text='Автор заказа', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='order_intakes', to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('order', models.OneToOneField(blank=True, help_text='Заказ, созданный по заявке', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='intake', to='orders.order', verbose_name='Заказ')),
+                ('service', models.ForeignKey(help_text='Заказываемая услуга', on_delete=django.db.models.deletion.CASCADE, related_name='order_intakes', to='orders.service', verbose_name='Услуга')),
+            ],
+            options={
+                'verbose_name': 'Заявка на заказ',
+                'verbose_name_plural': 'Заявки на заказы',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='orderintake',
+            index=models.Index(condition=models.Q(time_flushed__isnull=True), fields=['id'], name='order_intake_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orderintake',
+            index=models.Index(fields=['time_flushed'], name='order_intake_flushed_idx'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 3.2 on 2026-10-18 15:51
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+search = import_module('orders.migrations.0007_parameter_value_search')
+
+
+def recreate_search_triggers(apps, schema_editor):
+    # SQLite rebuilds the table to add or remove columns, which drops the
+    # triggers keeping the search index in sync.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in search.SQLITE_BACKWARD[:3] + search.SQLITE_FORWARD[1:]:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0010_order_intake'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            migrations.RunPython.noop, recreate_search_triggers),
+        migrations.AddField(
+            model_name='archivedparameterinorder',
+            name='value_bool',
+            field=models.BooleanField(blank=True, editable=False, help_text='Значение параметра с типом "Чекбокс"', null=True, verbose_name='Логическое значение'),
+        ),
+        migrations.AddField(
+            model_name='archivedparameterinorder',
+            name='value_int',
+            field=models.BigIntegerField(blank=True, editable=False, help_text='Значение параметра с типом "Целое число"', null=True, verbose_name='Числовое значение'),
+        ),
+        migrations.AddField(
+            model_name='parameterinorder',
+            name='value_bool',
+            field=models.BooleanField(blank=True, editable=False, help_text='Значение параметра с типом "Чекбокс"', null=True, verbose_name='Логическое значение'),
+        ),
+        migrations.AddField(
+            model_name='parameterinorder',
+            name='value_int',
+            field=models.BigIntegerField(blank=True, editable=False, help_text='Значение параметра с типом "Целое число"', null=True, verbose_name='Числовое значение'),
+        ),
+        migrations.AddIndex(
+            model_name='parameterinorder',
+            index=models.Index(condition=models.Q(value_int__isnull=False), fields=['parameter', 'value_int', 'order'], name='parameter_value_int_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='parameterinorder',
+            index=models.Index(condition=models.Q(value_bool__isnull=False), fields=['parameter', 'value_bool', 'order'], name='parameter_value_bool_idx'),
+        ),
+        migrations.RunPython(
+            recreate_search_triggers, migrations.RunPython.noop),
+    ]
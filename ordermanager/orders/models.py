@@ -1,5 +1,17 @@
+from collections import Counter
+from datetime import timedelta
+from heapq import merge
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import IntegrityError, connections, models, transaction
+from django.db.models import Q, sql
+from django.db.models.functions import Coalesce, TruncHour
+from django.utils import timezone
+
+from .events import publish_orders_event
+from .fragments import bump_order_list_version
+from .open_orders import record_open_orders
 
 User = get_user_model()
 
@@ -66,7 +78,227 @@ class ParameterInService(models.Model):
             f'с типом "{self.type}"')
 
 
-class Order(models.Model):
+CHECKBOX_VALUES = {
+    'да': True, 'нет': False, 'true': True, 'false': False,
+    'on': True, 'off': False, '1': True, '0': False,
+}
+
+PARAMETER_VALUE_ERRORS = {
+    'number': 'Значение параметра "{title}" должно быть целым числом.',
+    'checkbox': 'Значение параметра "{title}" должно быть "Да" или "Нет".',
+}
+
+
+def convert_parameter_value(type, value):
+    """Return the typed columns of a parameter value of the given type.
+
+    Raise ``ValueError`` when the value does not match the type.
+    """
+    if type == 'number':
+        number = int(value)
+        if not -2 ** 63 <= number < 2 ** 63:
+            raise ValueError(f'Number out of range: {value}')
+        return {'value_int': number}
+    if type == 'checkbox':
+        try:
+            return {'value_bool': CHECKBOX_VALUES[value.strip().lower()]}
+        except KeyError:
+            raise ValueError(f'Not a checkbox value: {value}')
+    return {}
+
+
+def build_parameters_snapshot(parameters):
+    """Return the snapshot of ``(title, value)`` pairs of an order."""
+    return [
+        {'parameter': title, 'value': value} for title, value in parameters]
+
+
+def prefetch_missing_parameters(orders):
+    """Prefetch parameters of the orders that have no snapshot yet."""
+    missing = [order for order in orders if order.parameters_snapshot is None]
+    if not missing:
+        return
+    parameters_model = missing[0]._meta.get_field(
+        'parameters_assigned').related_model
+    models.prefetch_related_objects(missing, models.Prefetch(
+        'parameters_assigned',
+        queryset=parameters_model.objects.select_related('parameter'),
+    ))
+
+
+def can_return_rows_from_update(connection):
+    """Return whether the backend supports ``UPDATE ... RETURNING``."""
+    if connection.vendor == 'postgresql':
+        return True
+    return (
+        connection.vendor == 'sqlite'
+        and connection.Database.sqlite_version_info >= (3, 35))
+
+
+class BaseOrderQuerySet(models.QuerySet):
+    def with_parameters(self):
+        """Load what is needed to show orders with their parameters.
+
+        Parameters are read from the snapshot, orders without one get their
+        parameters prefetched by ``prefetch_missing_parameters``.
+        """
+        return self.select_related('service')
+
+
+class OrderParametersMixin:
+    def get_parameters(self):
+        """Return the parameters of the order as a snapshot."""
+        if self.parameters_snapshot is not None:
+            return self.parameters_snapshot
+        prefetch_missing_parameters([self])
+        return build_parameters_snapshot(
+            (item.parameter.title, item.value)
+            for item in self.parameters_assigned.all())
+
+
+class OrderQuerySet(BaseOrderQuerySet):
+    CLAIM_ATTEMPTS = 10
+
+    def get_stale_claim_time(self):
+        return timezone.now() - timedelta(
+            seconds=getattr(settings, 'ORDER_CLAIM_TIMEOUT', 30 * 60))
+
+    def available_to(self, performer=None):
+        """Filter open orders the performer may claim or complete.
+
+        Those are orders nobody has claimed, claimed by the performer or
+        claimed more than ``ORDER_CLAIM_TIMEOUT`` seconds ago. A stale claim
+        is released this way, the order goes back to the queue.
+        """
+        available = Q(performer__isnull=True) | Q(
+            time_updated__lt=self.get_stale_claim_time())
+        if performer is not None:
+            available |= Q(performer=performer)
+        return self.filter(available, complete=False)
+
+    def available_branches(self, performer=None, stale=None):
+        """Split ``available_to`` into querysets read with an index each.
+
+        An index can't serve the ``OR`` of the conditions, the oldest
+        orders are looked up in every branch and merged instead.
+        """
+        stale = stale or self.get_stale_claim_time()
+        open_orders = self.filter(complete=False)
+        branches = [
+            open_orders.filter(performer__isnull=True),
+            open_orders.filter(
+                performer__isnull=False, time_updated__lt=stale),
+        ]
+        if performer is not None:
+            branches.append(open_orders.filter(performer=performer))
+        return branches
+
+    def oldest_available(self, limit, performer=None):
+        """Return ids of at most ``limit`` oldest orders available."""
+        rows = merge(*(
+            branch.order_by('time_created', 'id').values_list(
+                'time_created', 'id')[:limit]
+            for branch in self.available_branches(performer)))
+        ids = []
+        for _, pk in rows:
+            if not ids or ids[-1] != pk:
+                ids.append(pk)
+        return ids[:limit]
+
+    def claim_next(self, performer):
+        """Assign the oldest open order nobody has claimed to the performer.
+
+        The order is claimed with a conditional update retried on the next
+        candidate. On backends with ``SKIP LOCKED`` the candidate is locked
+        and concurrent callers skip it instead of queueing on it. Return the
+        claimed order or ``None`` if the queue is empty.
+        """
+        skip_locked = connections[
+            self.db].features.has_select_for_update_skip_locked
+        for _ in range(self.CLAIM_ATTEMPTS):
+            stale = self.get_stale_claim_time()
+            with transaction.atomic(using=self.db):
+                candidates = []
+                for branch in self.available_branches(stale=stale):
+                    branch = branch.exclude(performer=performer).order_by(
+                        'time_created', 'id')
+                    if skip_locked:
+                        branch = branch.select_for_update(skip_locked=True)
+                    candidates.extend(branch[:1])
+                if not candidates:
+                    return None
+                order = min(
+                    candidates, key=lambda order: (
+                        order.time_created, order.id))
+                claimed = self.available_to().filter(pk=order.pk).exclude(
+                    performer=performer,
+                ).update(
+                    performer=performer, time_updated=timezone.now())
+                if claimed:
+                    bump_order_list_version(self.db)
+                    order.performer = performer
+                    return order
+        return None
+
+    def update_returning(self, returning, **values):
+        """Update rows like ``update()``, return the given fields of them."""
+        self._for_write = True
+        query = self.query.chain(sql.UpdateQuery)
+        query.add_update_values(values)
+        query.annotations = {}
+        update_sql, params = query.get_compiler(self.db).as_sql()
+        connection = connections[self.db]
+        columns = ', '.join(
+            connection.ops.quote_name(self.model._meta.get_field(name).column)
+            for name in returning)
+        with connection.cursor() as cursor:
+            cursor.execute(f'{update_sql} RETURNING {columns}', params)
+            return cursor.fetchall()
+
+    def complete_open(self, performer):
+        """Complete the open orders of the queryset with one UPDATE.
+
+        Orders completed by someone else in the meantime and orders claimed
+        by someone else are left alone. Return ids of the orders completed
+        by this call.
+        """
+        now = timezone.now()
+        values = {
+            'complete': True,
+            'performer': performer,
+            'time_completed': now,
+            'time_updated': now,
+        }
+        queryset = self.available_to(performer)
+        queryset._for_write = True
+        with transaction.atomic(using=queryset.db):
+            if can_return_rows_from_update(connections[queryset.db]):
+                rows = queryset.update_returning(
+                    ['id', 'service_id'], **values)
+            else:
+                rows = list(queryset.select_for_update().values_list(
+                    'id', 'service_id'))
+                queryset.filter(
+                    pk__in=[pk for pk, _ in rows]).update(**values)
+
+            per_service = Counter(service_id for _, service_id in rows)
+            for service_id, completed in per_service.items():
+                OrderCounter.objects.increment(
+                    service_id, now, performer.id, completed=completed)
+            if rows:
+                publish_orders_event(
+                    'orders_completed', 'ids', [pk for pk, _ in rows])
+                bump_order_list_version(queryset.db)
+                record_open_orders(
+                    removed=[pk for pk, _ in rows], using=queryset.db)
+        return sorted(pk for pk, _ in rows)
+
+    def mark_complete(self, pk, performer):
+        """Complete an open order, return whether this call completed it."""
+        return bool(self.filter(pk=pk).complete_open(performer))
+
+
+class Order(OrderParametersMixin, models.Model):
     author = models.ForeignKey(
         User, models.SET_NULL, null=True, related_name='orders_issued',
         verbose_name='Автор', help_text='Автор заказа',
@@ -76,16 +308,49 @@ class Order(models.Model):
         help_text='Заказываемая услуга')
     time_created = models.DateTimeField(auto_now_add=True, db_index=True)
     complete = models.BooleanField(
-        verbose_name='Выполнено', default=False, db_index=True)
+        verbose_name='Выполнено', default=False)
+    time_completed = models.DateTimeField(
+        null=True, blank=True, editable=False, verbose_name='Время выполнения')
+    time_updated = models.DateTimeField(
+        auto_now=True, verbose_name='Время изменения')
     performer = models.ForeignKey(
         User, models.SET_NULL, null=True, related_name='orders_performed',
         verbose_name='Исполнитель', help_text='Исполнитель заказа',
         limit_choices_to=models.Q(is_staff=True))
+    parameters_snapshot = models.JSONField(
+        null=True, blank=True, editable=False,
+        verbose_name='Параметры (копия)',
+        help_text='Копия параметров заказа для чтения без соединений')
+
+    objects = OrderQuerySet.as_manager()
 
     class Meta:
         ordering = ['time_created']
         verbose_name = 'Заказ'
         verbose_name_plural = 'Заказы'
+        indexes = [
+            models.Index(
+                fields=['complete', 'time_created', 'id'],
+                name='order_complete_created_idx',
+            ),
+            models.Index(
+                fields=['service', 'complete', 'time_created', 'id'],
+                name='order_service_created_idx',
+            ),
+            models.Index(
+                fields=['performer', 'complete', 'time_created', 'id'],
+                name='order_performer_created_idx',
+            ),
+            models.Index(
+                fields=['complete', 'time_updated'],
+                name='order_complete_updated_idx',
+            ),
+            models.Index(
+                fields=['time_created', 'id'],
+                name='order_unclaimed_idx',
+                condition=models.Q(complete=False, performer__isnull=True),
+            ),
+        ]
 
     def __str__(self):
         return f'Заказ #{self.id} {self.service.title}'
@@ -103,6 +368,14 @@ class ParameterInOrder(models.Model):
     value = models.TextField(
         max_length=2000, verbose_name='Значение',
         help_text='Значение параметра услуги в заказе')
+    value_int = models.BigIntegerField(
+        null=True, blank=True, editable=False,
+        verbose_name='Числовое значение',
+        help_text='Значение параметра с типом "Целое число"')
+    value_bool = models.BooleanField(
+        null=True, blank=True, editable=False,
+        verbose_name='Логическое значение',
+        help_text='Значение параметра с типом "Чекбокс"')
 
     class Meta:
         verbose_name = 'Параметр услуги в заказе'
@@ -113,6 +386,231 @@ class ParameterInOrder(models.Model):
                 name='unique_parameter_in_order',
             ),
         ]
+        indexes = [
+            models.Index(
+                fields=['parameter', 'value_int', 'order'],
+                name='parameter_value_int_idx',
+                condition=models.Q(value_int__isnull=False),
+            ),
+            models.Index(
+                fields=['parameter', 'value_bool', 'order'],
+                name='parameter_value_bool_idx',
+                condition=models.Q(value_bool__isnull=False),
+            ),
+        ]
+
+    def __str__(self):
+        return f'Параметр {self.parameter} в заказе {str(self.order)[6:]}'
+
+
+class ArchivedOrder(OrderParametersMixin, models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    author = models.ForeignKey(
+        User, models.SET_NULL, null=True,
+        related_name='archived_orders_issued', verbose_name='Автор',
+        help_text='Автор заказа')
+    service = models.ForeignKey(
+        Service, models.CASCADE, related_name='archived_orders',
+        verbose_name='Услуга', help_text='Заказываемая услуга')
+    time_created = models.DateTimeField(db_index=True)
+    complete = models.BooleanField(verbose_name='Выполнено', default=True)
+    time_completed = models.DateTimeField(
+        null=True, blank=True, editable=False, verbose_name='Время выполнения')
+    time_updated = models.DateTimeField(verbose_name='Время изменения')
+    performer = models.ForeignKey(
+        User, models.SET_NULL, null=True,
+        related_name='archived_orders_performed', verbose_name='Исполнитель',
+        help_text='Исполнитель заказа')
+    parameters_snapshot = models.JSONField(
+        null=True, blank=True, editable=False,
+        verbose_name='Параметры (копия)',
+        help_text='Копия параметров заказа для чтения без соединений')
+    time_archived = models.DateTimeField(auto_now_add=True)
+
+    objects = BaseOrderQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['time_created']
+        verbose_name = 'Архивный заказ'
+        verbose_name_plural = 'Архивные заказы'
+
+    def __str__(self):
+        return f'Заказ #{self.id} {self.service.title}'
+
+
+class ArchivedParameterInOrder(models.Model):
+    order = models.ForeignKey(
+        ArchivedOrder, models.CASCADE,
+        related_name='parameters_assigned', verbose_name='Заказ',
+        help_text='Заказ, в котором задан параметр услуги')
+    parameter = models.ForeignKey(
+        Parameter, models.CASCADE,
+        related_name='archived_orders_assigned', verbose_name='Параметр',
+        help_text='Параметр услуги, который задан в заказе')
+    value = models.TextField(
+        max_length=2000, verbose_name='Значение',
+        help_text='Значение параметра услуги в заказе')
+    value_int = models.BigIntegerField(
+        null=True, blank=True, editable=False,
+        verbose_name='Числовое значение',
+        help_text='Значение параметра с типом "Целое число"')
+    value_bool = models.BooleanField(
+        null=True, blank=True, editable=False,
+        verbose_name='Логическое значение',
+        help_text='Значение параметра с типом "Чекбокс"')
+
+    class Meta:
+        verbose_name = 'Параметр услуги в архивном заказе'
+        verbose_name_plural = 'Параметры услуг в архивных заказах'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['order', 'parameter'],
+                name='unique_parameter_in_archived_order',
+            ),
+        ]
 
     def __str__(self):
         return f'Параметр {self.parameter} в заказе {str(self.order)[6:]}'
+
+
+class OrderCounterQuerySet(models.QuerySet):
+    def increment(self, service_id, time, performer_id=None, created=0,
+                  completed=0):
+        """Add to the counters of the hour the given time falls into."""
+        lookup = {
+            'service_id': service_id,
+            'performer_id': performer_id,
+            'hour': time.replace(minute=0, second=0, microsecond=0),
+        }
+        changes = {
+            'created': models.F('created') + created,
+            'completed': models.F('completed') + completed,
+        }
+        if self.filter(**lookup).update(**changes):
+            return
+        try:
+            with transaction.atomic(using=self.db):
+                self.create(**lookup, created=created, completed=completed)
+        except IntegrityError:
+            self.filter(**lookup).update(**changes)
+
+    def rebuild(self):
+        """Recount all buckets from orders, archived ones included."""
+        with transaction.atomic(using=self.db):
+            if connections[self.db].vendor == 'postgresql':
+                with connections[self.db].cursor() as cursor:
+                    cursor.execute(
+                        f'LOCK TABLE {self.model._meta.db_table} '
+                        'IN EXCLUSIVE MODE')
+            self.all().delete()
+
+            buckets = {}
+            for model in [Order, ArchivedOrder]:
+                for row in model.objects.annotate(
+                    bucket=TruncHour('time_created'),
+                ).order_by().values('service_id', 'bucket').annotate(
+                    total=models.Count('id'),
+                ):
+                    key = (row['service_id'], None, row['bucket'])
+                    bucket = buckets.setdefault(key, [0, 0])
+                    bucket[0] += row['total']
+                for row in model.objects.filter(complete=True).annotate(
+                    bucket=TruncHour(
+                        Coalesce('time_completed', 'time_created')),
+                ).order_by().values(
+                    'service_id', 'performer_id', 'bucket',
+                ).annotate(total=models.Count('id')):
+                    key = (
+                        row['service_id'], row['performer_id'], row['bucket'])
+                    bucket = buckets.setdefault(key, [0, 0])
+                    bucket[1] += row['total']
+
+            self.bulk_create(
+                self.model(
+                    service_id=service_id, performer_id=performer_id,
+                    hour=hour, created=created, completed=completed)
+                for (service_id, performer_id, hour), (created, completed)
+                in buckets.items())
+        return len(buckets)
+
+
+class OrderCounter(models.Model):
+    service = models.ForeignKey(
+        Service, models.CASCADE, related_name='counters',
+        verbose_name='Услуга')
+    performer = models.ForeignKey(
+        User, models.DO_NOTHING, null=True, db_constraint=False,
+        related_name='order_counters', verbose_name='Исполнитель',
+        help_text='Пусто для счётчика созданных заказов')
+    hour = models.DateTimeField(verbose_name='Час')
+    created = models.PositiveIntegerField(
+        default=0, verbose_name='Создано заказов')
+    completed = models.PositiveIntegerField(
+        default=0, verbose_name='Выполнено заказов')
+
+    objects = OrderCounterQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Счётчик заказов'
+        verbose_name_plural = 'Счётчики заказов'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['service', 'performer', 'hour'],
+                condition=models.Q(performer__isnull=False),
+                name='unique_order_counter_performer',
+            ),
+            models.UniqueConstraint(
+                fields=['service', 'hour'],
+                condition=models.Q(performer__isnull=True),
+                name='unique_order_counter_service',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['hour'], name='order_counter_hour_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.service_id} {self.performer_id} {self.hour:%Y-%m-%d %H}'
+
+
+class OrderIntake(models.Model):
+    """Order accepted in buffered intake mode and not yet created."""
+    author = models.ForeignKey(
+        User, models.SET_NULL, null=True, related_name='order_intakes',
+        verbose_name='Автор', help_text='Автор заказа')
+    service = models.ForeignKey(
+        Service, models.CASCADE, related_name='order_intakes',
+        verbose_name='Услуга', help_text='Заказываемая услуга')
+    parameters = models.JSONField(
+        verbose_name='Параметры',
+        help_text='Пары названий и значений параметров заказа')
+    time_received = models.DateTimeField(
+        auto_now_add=True, verbose_name='Время приёма')
+    time_flushed = models.DateTimeField(
+        null=True, blank=True, verbose_name='Время обработки')
+    order = models.OneToOneField(
+        Order, models.SET_NULL, null=True, blank=True,
+        related_name='intake', verbose_name='Заказ',
+        help_text='Заказ, созданный по заявке')
+    error = models.TextField(
+        blank=True, verbose_name='Ошибка',
+        help_text='Почему заказ не был создан')
+
+    class Meta:
+        ordering = ['id']
+        verbose_name = 'Заявка на заказ'
+        verbose_name_plural = 'Заявки на заказы'
+        indexes = [
+            models.Index(
+                fields=['id'],
+                name='order_intake_pending_idx',
+                condition=models.Q(time_flushed__isnull=True),
+            ),
+            models.Index(
+                fields=['time_flushed'],
+                name='order_intake_flushed_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'Заявка #{self.id}'
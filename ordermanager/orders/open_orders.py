@@ -0,0 +1,260 @@
+import threading
+from bisect import bisect_left, insort
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from .cache_versions import get_version, new_version
+
+OPEN_ORDERS_KEY = 'orders:open_orders'
+OPEN_ORDERS_BUILT_KEY = 'orders:open_orders:built'
+OPEN_ORDERS_SEQUENCE_KEY = 'orders:open_orders:sequence'
+OPEN_ORDERS_EVENT_KEY = 'orders:open_orders:event:{sequence}'
+OPEN_ORDERS_EVENT_TIMEOUT = 60 * 60
+OPEN_ORDERS_COMPACT_EVENTS = 1000
+OPEN_ORDERS_MAX_EVENTS = 10000
+
+OpenOrder = namedtuple('OpenOrder', ['time_created', 'id', 'service_id'])
+
+
+class OpenOrders:
+    """Open orders sorted by ``(time_created, id)`` like the order lists.
+
+    ``version`` changes whenever the set changes, it is suitable for
+    ETags and cache keys. ``entries`` is updated in place by later events,
+    read it under ``lock``.
+    """
+
+    def __init__(self, version, entries, lock=None):
+        self.version = version
+        self.entries = entries
+        self.lock = lock or threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def all(self):
+        """Return a copy of the entries."""
+        with self.lock:
+            return list(self.entries)
+
+    def page(self, key, backwards, size):
+        """Return ``size`` orders after the ``(time_created, id)`` key.
+
+        With ``backwards`` return orders before the key, nearest first.
+        """
+        with self.lock:
+            return self.get_page(key, backwards, size)
+
+    def get_page(self, key, backwards, size):
+        if backwards:
+            end = len(self.entries) if key is None else bisect_left(
+                self.entries, key)
+            return self.entries[max(end - size, 0):end][::-1]
+        start = 0 if key is None else bisect_left(
+            self.entries, (key[0], key[1] + 1))
+        return self.entries[start:start + size]
+
+
+def is_materialized():
+    return getattr(settings, 'ORDER_LIST_MODE', 'database') == 'materialized'
+
+
+def _event_key(sequence):
+    return OPEN_ORDERS_EVENT_KEY.format(sequence=sequence)
+
+
+def _append_event(added, removed):
+    try:
+        sequence = cache.incr(OPEN_ORDERS_SEQUENCE_KEY)
+    except ValueError:
+        # Nothing is materialized yet, the first read loads the database.
+        return
+    cache.set(
+        _event_key(sequence), (added, removed), OPEN_ORDERS_EVENT_TIMEOUT)
+
+
+def record_open_orders(added=(), removed=(), using=None):
+    """Add and remove orders of the open set once the transaction commits.
+
+    ``added`` are orders, ``removed`` are ids. Every call appends one event
+    to a log in the cache.
+    """
+    if not is_materialized():
+        return
+    added = [
+        OpenOrder(order.time_created, order.id, order.service_id)
+        for order in added]
+    removed = list(removed)
+    if added or removed:
+        transaction.on_commit(
+            lambda: _append_event(added, removed), using=using)
+
+
+def load_open_orders():
+    """Return open orders from the database keyed by id.
+
+    Orders are read from the primary, a lagging replica would miss orders
+    whose events are already in the log.
+    """
+    from .models import Order
+
+    return {
+        pk: OpenOrder(time_created, pk, service_id)
+        for time_created, pk, service_id in Order.objects.using(
+            DEFAULT_DB_ALIAS).filter(complete=False).values_list(
+            'time_created', 'id', 'service_id').iterator()
+    }
+
+
+def store_snapshot(sequence, orders, built=None):
+    """Save open orders as of the sequence number, return the snapshot."""
+    snapshot = {
+        'sequence': sequence,
+        'built': built or new_version(),
+        'orders': orders,
+    }
+    cache.set(OPEN_ORDERS_KEY, snapshot, None)
+    cache.set(OPEN_ORDERS_BUILT_KEY, snapshot['built'], None)
+    return snapshot
+
+
+def read_sequence():
+    # Starting from the current time also keeps leftover events of a
+    # sequence lost on eviction from being taken for new ones.
+    return get_version(OPEN_ORDERS_SEQUENCE_KEY)
+
+
+def rebuild_snapshot():
+    """Materialize open orders from the database.
+
+    The sequence is read before the database, so every event up to it is
+    already committed there and readers apply every later one on top.
+    """
+    sequence = read_sequence()
+    return store_snapshot(sequence, load_open_orders())
+
+
+class MaterializedOpenOrders:
+    """Copy of the open orders in this process, caught up on every read.
+
+    The cache holds a snapshot of the open orders and a log of events
+    after it. A read checks the head of the log and applies only events it
+    has not seen yet, the snapshot is loaded when the process starts or
+    the snapshot is rebuilt. Every ``OPEN_ORDERS_COMPACT_EVENTS`` events
+    are folded into a new snapshot.
+
+    A missing event is either being written right now or was evicted.
+    Later events are applied anyway and the missing one is looked for on
+    every read, until it turns up or more than ``OPEN_ORDERS_MAX_EVENTS``
+    events are pending and the snapshot is rebuilt.
+
+    Events are applied in place to one sorted list, so the open orders
+    returned earlier change as well and are read under the same lock.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.built = None
+
+    def get(self):
+        head = cache.get_many(
+            [OPEN_ORDERS_BUILT_KEY, OPEN_ORDERS_SEQUENCE_KEY])
+        built = head.get(OPEN_ORDERS_BUILT_KEY)
+        sequence = head.get(OPEN_ORDERS_SEQUENCE_KEY)
+        with self.lock:
+            if built is None or sequence is None:
+                self.load(rebuild_snapshot())
+            elif built != self.built or sequence < self.sequence:
+                snapshot = cache.get(OPEN_ORDERS_KEY)
+                if snapshot is None or snapshot['built'] != built or (
+                        sequence - snapshot['sequence']
+                        > OPEN_ORDERS_MAX_EVENTS):
+                    snapshot = rebuild_snapshot()
+                self.load(snapshot)
+            if sequence is not None and sequence > self.complete:
+                self.catch_up(sequence)
+            return self.current
+
+    def load(self, snapshot):
+        self.built = snapshot['built']
+        self.orders = snapshot['orders']
+        self.snapshot_sequence = self.complete = self.sequence = (
+            snapshot['sequence'])
+        self.entries = sorted(self.orders.values())
+        self.current = OpenOrders(self.get_version(), self.entries, self.lock)
+
+    def get_version(self):
+        # A missing event that turns up later changes the version as well.
+        return f'{self.built}.{self.complete}.{self.sequence}'
+
+    def catch_up(self, sequence):
+        if sequence - self.complete > OPEN_ORDERS_MAX_EVENTS:
+            # An event is missing for too long or this process is too far
+            # behind, the database is read instead of every pending event.
+            self.load(rebuild_snapshot())
+            return
+        numbers = range(self.complete + 1, sequence + 1)
+        events = cache.get_many([_event_key(number) for number in numbers])
+        if sequence == self.sequence and not events:
+            return
+        for number in numbers:
+            event = events.get(_event_key(number))
+            if event is None:
+                continue
+            if self.complete == number - 1:
+                self.complete = number
+            added, removed = event
+            for entry in added:
+                self.discard(entry.id)
+                self.orders[entry.id] = entry
+                insort(self.entries, entry)
+            for pk in removed:
+                self.discard(pk)
+        self.sequence = sequence
+        self.current = OpenOrders(self.get_version(), self.entries, self.lock)
+
+        if (self.complete == sequence and sequence - self.snapshot_sequence
+                >= OPEN_ORDERS_COMPACT_EVENTS):
+            store_snapshot(sequence, self.orders, built=self.built)
+            self.snapshot_sequence = sequence
+
+    def discard(self, pk):
+        entry = self.orders.pop(pk, None)
+        if entry is not None:
+            index = bisect_left(self.entries, entry)
+            if index < len(self.entries) and self.entries[index] == entry:
+                del self.entries[index]
+
+
+materialized = MaterializedOpenOrders()
+
+
+def get_open_orders():
+    """Return the materialized open orders."""
+    return materialized.get()
+
+
+def reconcile_open_orders():
+    """Compare open orders with the database, rebuild them on mismatch.
+
+    Return how many orders were missing and extra, or ``None`` when open
+    orders are not materialized. Orders changing while they are compared
+    can show up as a mismatch, the rebuild is harmless then.
+    """
+    if not is_materialized():
+        return None
+    current = set(get_open_orders().all())
+    sequence = read_sequence()
+    orders = load_open_orders()
+    rebuilt = set(orders.values())
+    result = {
+        'open': len(rebuilt),
+        'missing': len(rebuilt - current),
+        'extra': len(current - rebuilt),
+    }
+    if result['missing'] or result['extra']:
+        store_snapshot(sequence, orders)
+    return result
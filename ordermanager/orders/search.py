@@ -0,0 +1,38 @@
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .models import Order, ParameterInOrder
+
+SQLITE_FTS_TABLE = 'orders_parameterinorder_fts'
+TRIGRAM_LENGTH = 3
+
+
+def filter_values(values, query):
+    """Filter parameter rows whose value contains the query.
+
+    PostgreSQL serves ``icontains`` from the trigram GIN index on
+    ``UPPER(value)``, SQLite uses the FTS5 trigram table kept in sync by
+    triggers. Queries shorter than a trigram fall back to a plain scan.
+    """
+    if connection.vendor == 'sqlite' and len(query) >= TRIGRAM_LENGTH:
+        phrase = '"{}"'.format(query.replace('"', '""'))
+        return values.filter(id__in=RawSQL(
+            f'SELECT rowid FROM {SQLITE_FTS_TABLE} '
+            f'WHERE {SQLITE_FTS_TABLE} MATCH %s',
+            [phrase],
+        ))
+    return values.filter(value__icontains=query)
+
+
+def search_orders(query, parameter=None, service=None, queryset=None):
+    """Return orders with a parameter value containing the query."""
+    values = ParameterInOrder.objects.all()
+    if parameter:
+        values = values.filter(parameter__title=parameter)
+    values = filter_values(values, query)
+
+    orders = Order.objects.all() if queryset is None else queryset
+    orders = orders.filter(id__in=values.values('order_id'))
+    if service:
+        orders = orders.filter(service_id=service)
+    return orders
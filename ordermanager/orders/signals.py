@@ -0,0 +1,76 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_logged_out
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .backends import invalidate_cached_user
+from .catalog import bump_catalog_version
+from .events import publish_order_event
+from .fragments import bump_order_list_version
+from .models import (
+    Order, OrderCounter, Parameter, ParameterInOrder, ParameterInService,
+    Service,
+)
+from .open_orders import record_open_orders
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+@receiver(post_save, sender=Parameter)
+@receiver(post_delete, sender=Parameter)
+@receiver(post_save, sender=ParameterInService)
+@receiver(post_delete, sender=ParameterInService)
+def invalidate_catalog(sender, using, **kwargs):
+    bump_catalog_version(using)
+
+
+@receiver(post_save, sender=Order)
+def count_order_created(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        OrderCounter.objects.increment(
+            instance.service_id, instance.time_created, created=1)
+
+
+@receiver(post_save, sender=Order)
+def announce_order_created(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        publish_order_event(
+            'order_created', instance.id, title=str(instance))
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+@receiver(post_save, sender=ParameterInOrder)
+@receiver(post_delete, sender=ParameterInOrder)
+def invalidate_order_list(sender, using, **kwargs):
+    bump_order_list_version(using)
+
+
+@receiver(post_save, sender=Order)
+def update_open_orders(sender, instance, raw, using, **kwargs):
+    if raw:
+        return
+    if instance.complete:
+        record_open_orders(removed=[instance.pk], using=using)
+    else:
+        record_open_orders(added=[instance], using=using)
+
+
+@receiver(post_delete, sender=Order)
+def remove_deleted_open_order(sender, instance, using, **kwargs):
+    if not instance.complete:
+        record_open_orders(removed=[instance.pk], using=using)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user(sender, instance, **kwargs):
+    invalidate_cached_user(instance.pk)
+
+
+@receiver(user_logged_out)
+def invalidate_logged_out_user(sender, user, **kwargs):
+    if user is not None:
+        invalidate_cached_user(user.pk)
@@ -0,0 +1,67 @@
+from collections import defaultdict
+
+from .models import build_parameters_snapshot
+
+SNAPSHOT_BATCH_SIZE = 1000
+
+
+def iter_batches(queryset, batch_size):
+    """Yield lists of orders in ``id`` order, one keyset page at a time."""
+    last_id = None
+    queryset = queryset.order_by('id')
+    while True:
+        page = queryset if last_id is None else queryset.filter(id__gt=last_id)
+        batch = list(page[:batch_size])
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1].id
+
+
+def load_snapshots(model, ids):
+    """Build snapshots of orders from their normalized parameter rows."""
+    parameters_model = model._meta.get_field(
+        'parameters_assigned').related_model
+    parameters = defaultdict(list)
+    for order_id, title, value in parameters_model.objects.filter(
+        order_id__in=ids,
+    ).order_by('id').values_list('order_id', 'parameter__title', 'value'):
+        parameters[order_id].append((title, value))
+    return {
+        order_id: build_parameters_snapshot(parameters[order_id])
+        for order_id in ids
+    }
+
+
+def backfill_snapshots(model, batch_size=SNAPSHOT_BATCH_SIZE):
+    """Write snapshots of orders that have none, yield batch sizes."""
+    queryset = model.objects.filter(
+        parameters_snapshot__isnull=True).only('id')
+    for batch in iter_batches(queryset, batch_size):
+        snapshots = load_snapshots(model, [order.id for order in batch])
+        for order in batch:
+            order.parameters_snapshot = snapshots[order.id]
+        model.objects.bulk_update(batch, ['parameters_snapshot'])
+        yield len(batch)
+
+
+def snapshot_key(snapshot):
+    return sorted((item['parameter'], item['value']) for item in snapshot)
+
+
+def find_inconsistent_snapshots(model, batch_size=SNAPSHOT_BATCH_SIZE):
+    """Yield orders whose snapshot differs from the normalized rows.
+
+    Every yielded order has ``parameters_snapshot`` set to the value built
+    from the normalized rows, ready to be saved.
+    """
+    queryset = model.objects.filter(
+        parameters_snapshot__isnull=False).only('id', 'parameters_snapshot')
+    for batch in iter_batches(queryset, batch_size):
+        snapshots = load_snapshots(model, [order.id for order in batch])
+        for order in batch:
+            expected = snapshots[order.id]
+            if snapshot_key(order.parameters_snapshot) != snapshot_key(
+                    expected):
+                order.parameters_snapshot = expected
+                yield order
@@ -1,10 +1,45 @@
+import csv
+import json
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from orders.models import Order, Service
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from orders import benchmark
+from orders.backends import get_user_cache_key
+from orders.cache_versions import bump_version, get_version
+from orders.catalog import get_service_schema
+from orders.checks import check_shared_cache
+from orders.events import broker, publish_orders_event
+from orders.feed import ORDER_FEED_PATH, order_feed
+from orders.intake import INTAKE_DEPTH_KEY
+from orders.models import (
+    ArchivedOrder, ArchivedParameterInOrder, Order, OrderIntake, Parameter,
+    ParameterInOrder, ParameterInService, Service,
+)
+from orders.open_orders import (
+    OPEN_ORDERS_EVENT_KEY, OPEN_ORDERS_KEY, OPEN_ORDERS_SEQUENCE_KEY,
+    _append_event, get_open_orders, reconcile_open_orders,
+)
 from django.shortcuts import reverse
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 
 User = get_user_model()
 
+# Sessions and users read from the cache, the defaults with a shared cache.
+CACHED_AUTHENTICATION = {
+    'SESSION_ENGINE': 'django.contrib.sessions.backends.cached_db',
+    'AUTHENTICATION_BACKENDS': ['orders.backends.CachedModelBackend'],
+}
+
 
 class BaseSetUp(TestCase):
     def setUp(self):
@@ -153,3 +188,795 @@ class OrdersViewsTest(ViewsTestBase, BaseSetUp):
         service_queryset = Service.objects.all()
         pages = [(reverse('orders:service_list'), service_queryset)]
         self.check_object_list_in_context(pages)
+
+
+class OrderCreateSetUp(BaseSetUp):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.another_user)
+        self.parameters = [
+            Parameter.objects.create(title=f'Параметр {q}') for q in range(5)]
+        for parameter in self.parameters:
+            ParameterInService.objects.create(
+                service=self.service, parameter=parameter, type='text')
+        self.url = reverse(
+            'orders:order_create', kwargs={'service_id': self.service.id})
+
+    def get_data(self, titles):
+        data = {'service': self.service.id, 'parameters_quantity': len(titles)}
+        for q, title in enumerate(titles):
+            data[f'parameter_title_{q}'] = title
+            data[f'parameter_value_{q}'] = f'значение {q}'
+        return data
+
+
+class OrderCreateFormTest(OrderCreateSetUp):
+    def test_parameters_saved(self):
+        titles = [parameter.title for parameter in self.parameters]
+        self.client.post(self.url, self.get_data(titles))
+        order = Order.objects.latest('id')
+        self.assertEqual(
+            set(order.parameters_assigned.values_list(
+                'parameter__title', flat=True)),
+            set(titles))
+
+    def test_query_count_does_not_depend_on_parameters(self):
+        self.client.post(self.url, self.get_data(['Параметр 0']))
+        with CaptureQueriesContext(connection) as few:
+            self.client.post(self.url, self.get_data(['Параметр 0']))
+        titles = [parameter.title for parameter in self.parameters]
+        with CaptureQueriesContext(connection) as many:
+            self.client.post(self.url, self.get_data(titles))
+        self.assertEqual(len(few), len(many))
+
+    def test_unknown_parameter_rejected(self):
+        orders_count = Order.objects.count()
+        unknown = Parameter.objects.create(title='Чужой параметр')
+        response = self.client.post(
+            self.url, self.get_data(['Параметр 0', unknown.title]))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].errors)
+        self.assertEqual(Order.objects.count(), orders_count)
+
+    def test_typed_values(self):
+        ParameterInService.objects.filter(
+            parameter__in=self.parameters[:2]).update(type='number')
+        ParameterInService.objects.filter(
+            parameter=self.parameters[2]).update(type='checkbox')
+        titles = [parameter.title for parameter in self.parameters[:3]]
+        data = self.get_data(titles)
+        data.update(parameter_value_0='15', parameter_value_1='пятнадцать')
+        response = self.client.post(self.url, data)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'должно быть целым числом')
+
+        data.update(parameter_value_1='-3', parameter_value_2='Да')
+        self.client.post(self.url, data)
+        order = Order.objects.latest('id')
+        self.assertEqual(
+            list(order.parameters_assigned.order_by('parameter__title')
+                 .values_list('value_int', 'value_bool')),
+            [(15, None), (-3, None), (None, True)])
+
+    def test_backfill_typed_values(self):
+        titles = [parameter.title for parameter in self.parameters[:2]]
+        data = self.get_data(titles)
+        data.update(parameter_value_0='7')
+        self.client.post(self.url, data)
+        ParameterInService.objects.filter(
+            parameter__in=self.parameters[:2]).update(type='number')
+
+        output = StringIO()
+        call_command(
+            'backfill_parameter_typed_values', batch_size=1, stdout=output)
+        self.assertIn('не соответствуют типу: 1', output.getvalue())
+        self.assertEqual(
+            list(ParameterInOrder.objects.order_by(
+                'parameter__title').values_list('value_int', flat=True)),
+            [7, None])
+
+    def test_schema_invalidated(self):
+        self.parameters[0].title = 'Новое наименование'
+        self.parameters[0].save()
+        self.assertIn(
+            'Новое наименование', get_service_schema(self.service.id))
+
+
+@override_settings(ORDER_INTAKE_MODE='buffered')
+class BufferedOrderIntakeTest(OrderCreateSetUp):
+    def setUp(self):
+        super().setUp()
+        cache.delete(INTAKE_DEPTH_KEY)
+
+    def test_order_queued_and_flushed(self):
+        orders_count = Order.objects.count()
+        titles = [parameter.title for parameter in self.parameters[:2]]
+        response = self.client.post(self.url, self.get_data(titles))
+        self.assertRedirects(
+            response, reverse('orders:index'), fetch_redirect_response=False)
+        intake = OrderIntake.objects.get()
+        self.assertEqual(Order.objects.count(), orders_count)
+
+        call_command('flush_order_intake', stdout=StringIO())
+        intake.refresh_from_db()
+        self.assertIsNotNone(intake.time_flushed)
+        self.assertEqual(intake.order.author, self.another_user)
+        self.assertEqual(
+            intake.order.get_parameters(),
+            [{'parameter': 'Параметр 0', 'value': 'значение 0'},
+             {'parameter': 'Параметр 1', 'value': 'значение 1'}])
+        self.assertEqual(intake.order.parameters_assigned.count(), 2)
+
+    def test_flush_revalidates(self):
+        self.client.post(self.url, self.get_data(['Параметр 0']))
+        ParameterInService.objects.filter(
+            parameter=self.parameters[0]).delete()
+        call_command('flush_order_intake', stdout=StringIO())
+        intake = OrderIntake.objects.get()
+        self.assertIsNone(intake.order)
+        self.assertIn('Параметр 0', intake.error)
+
+    def test_flush_rejects_only_changed_orders(self):
+        for title in ['Параметр 0', 'Параметр 1']:
+            self.client.post(self.url, self.get_data([title]))
+        schema = get_service_schema(self.service.id)
+        self.parameters[0].delete()
+        # The cached schema of the service is not updated yet.
+        with mock.patch(
+                'orders.intake.get_service_schema', return_value=schema):
+            call_command('flush_order_intake', stdout=StringIO())
+        rejected, created = OrderIntake.objects.all()
+        self.assertIsNone(rejected.order)
+        self.assertIn('Параметр 0', rejected.error)
+        self.assertEqual(created.error, '')
+        self.assertEqual(
+            created.order.get_parameters(),
+            [{'parameter': 'Параметр 1', 'value': 'значение 0'}])
+
+    @override_settings(ORDER_INTAKE_MAX_PENDING=1)
+    def test_backpressure(self):
+        self.client.post(self.url, self.get_data(['Параметр 0']))
+        response = self.client.post(self.url, self.get_data(['Параметр 0']))
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(OrderIntake.objects.count(), 1)
+
+        call_command('flush_order_intake', stdout=StringIO())
+        response = self.client.post(self.url, self.get_data(['Параметр 0']))
+        self.assertEqual(response.status_code, 302)
+
+    def test_depth_counted_once(self):
+        for count in [1, 0]:
+            with CaptureQueriesContext(connection) as context:
+                self.client.post(self.url, self.get_data(['Параметр 0']))
+            self.assertEqual(
+                len([query for query in context.captured_queries
+                     if 'COUNT(' in query['sql']]), count)
+        self.assertEqual(cache.get(INTAKE_DEPTH_KEY), 2)
+        call_command('flush_order_intake', stdout=StringIO())
+        self.assertEqual(cache.get(INTAKE_DEPTH_KEY), 0)
+
+    def test_flusher_stops_in_direct_mode(self):
+        self.client.post(self.url, self.get_data(['Параметр 0']))
+        with override_settings(ORDER_INTAKE_MODE='direct'), mock.patch(
+                'orders.management.commands.flush_order_intake.time.sleep',
+                side_effect=AssertionError):
+            call_command('flush_order_intake', interval=1, stdout=StringIO())
+        self.assertIsNotNone(OrderIntake.objects.get().order)
+
+    def test_stats(self):
+        self.client.post(self.url, self.get_data(['Параметр 0']))
+        output = StringIO()
+        call_command('flush_order_intake', stats=True, stdout=output)
+        self.assertEqual(json.loads(output.getvalue())['pending'], 1)
+
+        call_command('flush_order_intake', stdout=StringIO())
+        output = StringIO()
+        call_command('flush_order_intake', stats=True, stdout=output)
+        stats = json.loads(output.getvalue())
+        self.assertEqual(stats['pending'], 0)
+        self.assertEqual(stats['flushed'], 1)
+        self.assertGreater(stats['average_latency_seconds'], 0)
+
+
+class OrderCompleteViewTest(BaseSetUp):
+    def test_complete_only_once(self):
+        url = reverse('orders:order_complete', kwargs={'pk': self.order.id})
+        self.client.post(url)
+
+        performer = User.objects.create(username='performer', is_staff=True)
+        self.client.force_login(performer)
+        response = self.client.post(url)
+        self.assertRedirects(
+            response,
+            reverse('orders:order_detail', kwargs={'pk': self.order.id}))
+        self.order.refresh_from_db()
+        self.assertTrue(self.order.complete)
+        self.assertEqual(self.order.performer, self.user)
+
+    def test_keep_order_claimed_by_another_performer(self):
+        performer = User.objects.create(username='performer', is_staff=True)
+        Order.objects.claim_next(performer)
+        url = reverse('orders:order_complete', kwargs={'pk': self.order.id})
+        response = self.client.post(url, follow=True)
+        self.assertContains(
+            response, 'Заказ взят в работу другим сотрудником.')
+        self.order.refresh_from_db()
+        self.assertFalse(self.order.complete)
+        self.assertEqual(self.order.performer, performer)
+
+    def test_message_shown_on_cached_page(self):
+        Order.objects.claim_next(
+            User.objects.create(username='performer', is_staff=True))
+        detail = reverse('orders:order_detail', kwargs={'pk': self.order.id})
+        etag = self.client.get(detail)['ETag']
+        self.client.post(
+            reverse('orders:order_complete', kwargs={'pk': self.order.id}))
+        response = self.client.get(detail, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(
+            response, 'Заказ взят в работу другим сотрудником.')
+
+    def test_complete_missing_order(self):
+        url = reverse('orders:order_complete', kwargs={'pk': 0})
+        self.assertEqual(self.client.post(url).status_code, 404)
+
+
+class OrderEventsTest(TestCase):
+    def test_batches_fit_into_notify(self):
+        ids = list(range(1000, 1010))
+        with mock.patch('orders.events.NOTIFY_PAYLOAD_LIMIT', 30), \
+                mock.patch.object(broker, 'publish') as publish, \
+                self.captureOnCommitCallbacks(execute=True):
+            publish_orders_event('orders_completed', 'ids', ids)
+        batches = [call.args[0]['ids'] for call in publish.call_args_list]
+        self.assertEqual(batches, [ids[:5], ids[5:]])
+
+
+class OrderFeedTest(BaseSetUp):
+    def get_communicator(self):
+        cookie = f'{settings.SESSION_COOKIE_NAME}=' + self.client.cookies[
+            settings.SESSION_COOKIE_NAME].value
+        return ApplicationCommunicator(order_feed, {
+            'type': 'http',
+            'path': ORDER_FEED_PATH,
+            'headers': [(b'cookie', cookie.encode())],
+        })
+
+    async def test_staff_receives_events(self):
+        communicator = self.get_communicator()
+        await communicator.send_input({'type': 'http.request'})
+        start = await communicator.receive_output()
+        self.assertEqual(start['status'], 200)
+
+        broker.publish({'event': 'orders_completed', 'ids': [self.order.id]})
+        message = await communicator.receive_output()
+        self.assertIn(b'event: orders_completed', message['body'])
+
+        await communicator.send_input({'type': 'http.disconnect'})
+        await communicator.wait()
+
+    async def test_non_staff_forbidden(self):
+        await sync_to_async(self.client.force_login)(self.another_user)
+        communicator = self.get_communicator()
+        start = await communicator.receive_output()
+        self.assertEqual(start['status'], 403)
+
+
+class OrderExportTest(BaseSetUp):
+    def setUp(self):
+        super().setUp()
+        parameter = Parameter.objects.create(title='Телефон')
+        ParameterInOrder.objects.create(
+            order=self.order, parameter=parameter, value='123')
+        self.another_service = Service.objects.create(title='Другая услуга')
+        self.other_order = Order.objects.create(
+            service=self.another_service, complete=True)
+        self.url = reverse('orders:order_export')
+
+    def read_ndjson(self, content):
+        return [json.loads(line) for line in content.splitlines()]
+
+    def test_ndjson(self):
+        response = self.client.get(self.url, {'format': 'ndjson'})
+        rows = self.read_ndjson(b''.join(response.streaming_content))
+        self.assertEqual(
+            [row['id'] for row in rows], [self.order.id, self.other_order.id])
+        self.assertEqual(
+            rows[0]['parameters'], [{'parameter': 'Телефон', 'value': '123'}])
+
+    def test_csv_filters(self):
+        response = self.client.get(
+            self.url, {'service': self.service.id, 'complete': 'false'})
+        rows = list(csv.DictReader(
+            b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual([int(row['id']) for row in rows], [self.order.id])
+
+    def test_invalid_filters(self):
+        response = self.client.get(self.url, {'created_after': 'вчера'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_forbidden(self):
+        self.client.force_login(self.another_user)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_command(self):
+        stdout = StringIO()
+        call_command(
+            'export_orders', format='ndjson', complete='true',
+            chunk_size=1, stdout=stdout)
+        rows = self.read_ndjson(stdout.getvalue())
+        self.assertEqual([row['id'] for row in rows], [self.other_order.id])
+
+
+class ArchiveOrdersTest(BaseSetUp):
+    def setUp(self):
+        super().setUp()
+        parameter = Parameter.objects.create(title='Адрес')
+        self.old_orders = [
+            Order.objects.create(service=self.service, complete=True)
+            for _ in range(3)]
+        for order in self.old_orders:
+            ParameterInOrder.objects.create(
+                order=order, parameter=parameter, value=f'Дом {order.id}')
+        Order.objects.filter(id__in=[o.id for o in self.old_orders]).update(
+            time_created=timezone.now() - timedelta(days=40))
+
+    def test_archive_completed_orders(self):
+        call_command(
+            'archive_orders', days=30, batch_size=2, stdout=StringIO())
+        self.assertQuerysetEqual(
+            Order.objects.all(), [repr(self.order)], transform=repr)
+        self.assertEqual(ArchivedOrder.objects.count(), 3)
+        self.assertEqual(ArchivedParameterInOrder.objects.count(), 3)
+
+    def test_archive_without_signals(self):
+        with mock.patch('orders.cache_versions.bump_version') as bump, \
+                CaptureQueriesContext(connection) as context:
+            call_command('archive_orders', days=30, stdout=StringIO())
+        bump.assert_not_called()
+        deletes = [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith('DELETE')]
+        self.assertEqual(len(deletes), 2)
+
+    def test_keep_recently_completed_orders(self):
+        Order.objects.filter(pk=self.old_orders[0].id).update(
+            time_completed=timezone.now())
+        call_command('archive_orders', days=30, stdout=StringIO())
+        self.assertTrue(
+            Order.objects.filter(pk=self.old_orders[0].id).exists())
+        self.assertEqual(ArchivedOrder.objects.count(), 2)
+
+    def test_export_archived_orders(self):
+        call_command('archive_orders', days=30, stdout=StringIO())
+        response = self.client.get(
+            reverse('orders:order_export'), {'format': 'ndjson'})
+        rows = [
+            json.loads(line)
+            for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(
+            [row['id'] for row in rows],
+            sorted([self.order.id] + [o.id for o in self.old_orders]))
+        self.assertEqual(
+            rows[-1]['parameters'],
+            [{'parameter': 'Адрес', 'value': f'Дом {rows[-1]["id"]}'}])
+
+    def test_max_batches(self):
+        call_command(
+            'archive_orders', days=30, batch_size=2, max_batches=1,
+            stdout=StringIO())
+        self.assertEqual(ArchivedOrder.objects.count(), 2)
+
+    def test_archived_order_detail(self):
+        call_command('archive_orders', days=30, stdout=StringIO())
+        order = self.old_orders[0]
+        response = self.client.get(
+            reverse('orders:order_detail', kwargs={'pk': order.id}))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, f'Дом {order.id}')
+
+
+class OrderConditionalGetTest(BaseSetUp):
+    def test_detail_not_modified(self):
+        url = reverse('orders:order_detail', kwargs={'pk': self.order.id})
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.client.post(
+            reverse('orders:order_complete', kwargs={'pk': self.order.id}))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_list_not_modified(self):
+        url = reverse('orders:order_list')
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.client.force_login(
+            User.objects.create(username='staff', is_staff=True))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(**CACHED_AUTHENTICATION)
+class CachedAuthenticationTest(BaseSetUp):
+    def get_auth_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        return response, [
+            query['sql'] for query in context.captured_queries
+            if 'django_session' in query['sql']
+            or 'auth_user' in query['sql']]
+
+    def test_no_auth_queries(self):
+        url = reverse('orders:order_list')
+        self.client.get(url)
+        response, queries = self.get_auth_queries(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries, [])
+
+    def test_staff_flag_change(self):
+        url = reverse('orders:order_list')
+        self.client.get(url)
+        self.user.is_staff = False
+        self.user.save()
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+    def test_password_change(self):
+        url = reverse('orders:order_list')
+        self.client.get(url)
+        self.user.set_password('new password')
+        self.user.save()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 302)
+
+    def test_logout(self):
+        self.client.get(reverse('orders:order_list'))
+        self.assertIsNotNone(cache.get(get_user_cache_key(self.user.pk)))
+        self.client.logout()
+        self.assertIsNone(cache.get(get_user_cache_key(self.user.pk)))
+
+    def test_process_local_cache_warning(self):
+        self.assertEqual(
+            [warning.id for warning in check_shared_cache(None)],
+            ['orders.W001', 'orders.W002'])
+        with override_settings(ORDER_LIST_MODE='materialized'):
+            self.assertIn(
+                'orders.W003',
+                [warning.id for warning in check_shared_cache(None)])
+        with mock.patch('orders.checks.is_shared_cache', return_value=True):
+            self.assertEqual(check_shared_cache(None), [])
+
+
+class OrderAdminTest(BaseSetUp):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create(
+            username='admin', is_staff=True, is_superuser=True))
+        self.client.get(reverse('admin:index'))
+        self.parameter = Parameter.objects.create(title='Адрес')
+
+    def create_orders(self, quantity):
+        Order.objects.bulk_create(
+            Order(service=self.service, author=self.another_user,
+                  performer=self.user)
+            for _ in range(quantity))
+        ParameterInOrder.objects.bulk_create(
+            ParameterInOrder(
+                order_id=order_id, parameter=self.parameter, value='Дом')
+            for order_id in Order.objects.filter(
+                parameters_assigned__isnull=True).values_list('id', flat=True))
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_changelist_query_count_is_constant(self):
+        for name in ['order', 'parameterinorder']:
+            with self.subTest(name=name):
+                url = reverse(f'admin:orders_{name}_changelist')
+                ParameterInOrder.objects.all().delete()
+                Order.objects.all().delete()
+                self.create_orders(5)
+                few = self.count_queries(url)
+                self.create_orders(45)
+                self.assertEqual(self.count_queries(url), few)
+
+    def test_search_by_id(self):
+        url = reverse('admin:orders_order_changelist')
+        response = self.client.get(url, {'q': self.order.id})
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.order])
+        response = self.client.get(url, {'q': 'abc'})
+        self.assertEqual(list(response.context['cl'].result_list), [])
+
+
+class ParameterSnapshotTest(BaseSetUp):
+    def setUp(self):
+        super().setUp()
+        self.parameter = Parameter.objects.create(title='Телефон')
+        ParameterInOrder.objects.create(
+            order=self.order, parameter=self.parameter, value='123')
+
+    def test_form_writes_snapshot(self):
+        ParameterInService.objects.create(
+            service=self.service, parameter=self.parameter, type='text')
+        self.client.force_login(self.another_user)
+        self.client.post(
+            reverse('orders:order_create',
+                    kwargs={'service_id': self.service.id}),
+            {
+                'service': self.service.id,
+                'parameters_quantity': 1,
+                'parameter_title_0': 'Телефон',
+                'parameter_value_0': '456',
+            })
+        order = Order.objects.latest('id')
+        self.assertEqual(
+            order.parameters_snapshot,
+            [{'parameter': 'Телефон', 'value': '456'}])
+
+    def test_backfill_and_check(self):
+        call_command('check_parameter_snapshots', stdout=StringIO())
+        call_command('backfill_parameter_snapshots', stdout=StringIO())
+        self.order.refresh_from_db()
+        self.assertEqual(
+            self.order.parameters_snapshot,
+            [{'parameter': 'Телефон', 'value': '123'}])
+
+        url = reverse('orders:order_detail', kwargs={'pk': self.order.id})
+        Order.objects.filter(id=self.order.id).update(parameters_snapshot=[])
+        etag = self.client.get(url)['ETag']
+        with self.assertRaises(CommandError):
+            call_command('check_parameter_snapshots', stdout=StringIO())
+        call_command(
+            'check_parameter_snapshots', fix=True, stdout=StringIO())
+        call_command('check_parameter_snapshots', stdout=StringIO())
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Телефон: 123')
+
+    def test_detail_served_from_snapshot(self):
+        Order.objects.filter(id=self.order.id).update(
+            parameters_snapshot=[{'parameter': 'Телефон', 'value': '789'}])
+        response = self.client.get(
+            reverse('orders:order_detail', kwargs={'pk': self.order.id}))
+        self.assertContains(response, 'Телефон: 789')
+
+
+class CacheVersionTest(TestCase):
+    key = 'orders:test_version'
+
+    def tearDown(self):
+        cache.delete(self.key)
+
+    def test_counter_restarts_after_eviction(self):
+        version = get_version(self.key)
+        bump_version(self.key)
+        self.assertEqual(get_version(self.key), version + 1)
+        cache.delete(self.key)
+        bump_version(self.key)
+        self.assertGreater(get_version(self.key), version + 1)
+
+
+@override_settings(**CACHED_AUTHENTICATION)
+class FragmentCacheTest(BaseSetUp):
+    def setUp(self):
+        super().setUp()
+        self.client.get(reverse('orders:order_list'))
+
+    def test_list_rendered_from_cache(self):
+        url = reverse('orders:order_list')
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertContains(response, str(self.order))
+
+    def test_list_invalidated(self):
+        url = reverse('orders:order_list')
+        order = Order.objects.create(service=self.service)
+        self.assertContains(self.client.get(url), f'order-{order.id}')
+
+        Order.objects.mark_complete(order.pk, self.user)
+        self.assertNotContains(self.client.get(url), f'order-{order.id}')
+
+        self.service.title = 'Новая услуга'
+        self.service.save()
+        self.assertContains(self.client.get(url), 'Новая услуга')
+
+    def test_detail_invalidated(self):
+        url = reverse('orders:order_detail', kwargs={'pk': self.order.id})
+        self.client.get(url)
+        self.service.title = 'Новая услуга'
+        self.service.save()
+        self.assertContains(
+            self.client.get(url), f'<h1>Заказ #{self.order.id} Новая услуга')
+
+        self.client.post(
+            reverse('orders:order_complete', kwargs={'pk': self.order.id}))
+        self.assertContains(self.client.get(url), 'Завершено')
+
+
+@override_settings(ORDER_LIST_MODE='materialized', **CACHED_AUTHENTICATION)
+class MaterializedOpenOrdersTest(BaseSetUp):
+    def setUp(self):
+        super().setUp()
+        cache.delete_many([OPEN_ORDERS_KEY, OPEN_ORDERS_SEQUENCE_KEY])
+        self.url = reverse('orders:order_list')
+        self.client.get(self.url)
+
+    def get_open_ids(self):
+        return [entry.id for entry in get_open_orders().entries]
+
+    def test_list_served_from_cache(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            order = Order.objects.create(service=self.service)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertContains(response, str(self.order))
+        self.assertContains(response, f'order-{order.id}')
+
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_list_keyed_on_open_orders(self):
+        # The order list version changes before the open orders event is
+        # appended, a list rendered in between must not be kept.
+        with mock.patch('orders.open_orders._append_event') as append, \
+                self.captureOnCommitCallbacks(execute=True):
+            order = Order.objects.create(service=self.service)
+        self.assertNotContains(self.client.get(self.url), f'order-{order.id}')
+        _append_event(*append.call_args.args)
+        self.assertContains(self.client.get(self.url), f'order-{order.id}')
+
+    def test_updated_by_events(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            order = Order.objects.create(service=self.service)
+        self.assertEqual(self.get_open_ids(), [self.order.id, order.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Order.objects.mark_complete(self.order.id, self.user)
+        self.assertEqual(self.get_open_ids(), [order.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            order.delete()
+        self.assertEqual(self.get_open_ids(), [])
+
+    def test_events_compacted(self):
+        with mock.patch('orders.open_orders.OPEN_ORDERS_COMPACT_EVENTS', 2):
+            for _ in range(2):
+                with self.captureOnCommitCallbacks(execute=True):
+                    Order.objects.create(service=self.service)
+            self.assertEqual(len(get_open_orders()), 3)
+        self.assertEqual(
+            cache.get(OPEN_ORDERS_KEY)['sequence'],
+            cache.get(OPEN_ORDERS_SEQUENCE_KEY))
+
+    def test_missing_event(self):
+        version = get_open_orders().version
+        cache.incr(OPEN_ORDERS_SEQUENCE_KEY)
+        with self.captureOnCommitCallbacks(execute=True):
+            order = Order.objects.create(service=self.service)
+        open_orders = get_open_orders()
+        self.assertEqual(
+            [entry.id for entry in open_orders.entries],
+            [self.order.id, order.id])
+
+        sequence = cache.get(OPEN_ORDERS_SEQUENCE_KEY)
+        cache.set(
+            OPEN_ORDERS_EVENT_KEY.format(sequence=sequence - 1),
+            ([], [self.order.id]))
+        self.assertEqual(self.get_open_ids(), [order.id])
+        self.assertNotIn(
+            get_open_orders().version, [version, open_orders.version])
+
+    def test_rebuilt_when_event_missing_too_long(self):
+        cache.incr(OPEN_ORDERS_SEQUENCE_KEY)
+        with mock.patch('orders.open_orders.OPEN_ORDERS_MAX_EVENTS', 2):
+            for _ in range(2):
+                with self.captureOnCommitCallbacks(execute=True):
+                    Order.objects.create(service=self.service)
+                open_orders = get_open_orders()
+        self.assertEqual(len(open_orders), 3)
+        self.assertEqual(
+            cache.get(OPEN_ORDERS_KEY)['sequence'],
+            cache.get(OPEN_ORDERS_SEQUENCE_KEY))
+
+    def test_events_applied_in_place(self):
+        entries = get_open_orders().entries
+        with self.captureOnCommitCallbacks(execute=True):
+            order = Order.objects.create(service=self.service)
+        self.assertIs(get_open_orders().entries, entries)
+        self.assertEqual(
+            [entry.id for entry in entries], [self.order.id, order.id])
+
+    def test_reconcile(self):
+        Order.objects.filter(id=self.order.id).update(complete=True)
+        order = Order.objects.create(service=self.service)
+        self.assertEqual(self.get_open_ids(), [self.order.id])
+
+        output = StringIO()
+        with mock.patch(
+                'orders.management.commands.reconcile_open_orders.'
+                'is_shared_cache', return_value=True):
+            call_command('reconcile_open_orders', stdout=output)
+        self.assertIn(
+            'не хватало в кэше: 1, лишних в кэше: 1', output.getvalue())
+        self.assertEqual(self.get_open_ids(), [order.id])
+
+    def test_reconcile_needs_shared_cache(self):
+        with self.assertRaises(CommandError):
+            call_command('reconcile_open_orders', stdout=StringIO())
+
+    @override_settings(ORDER_LIST_MODE='database')
+    def test_reconcile_without_materialization(self):
+        output = StringIO()
+        with mock.patch('orders.open_orders.load_open_orders') as load:
+            call_command('reconcile_open_orders', stdout=output)
+            self.assertIsNone(reconcile_open_orders())
+        load.assert_not_called()
+        self.assertIn('сверка не нужна', output.getvalue())
+
+
+class BenchmarkTest(TestCase):
+    def test_report(self):
+        data = benchmark.seed(services=2, parameters=2, orders=20, users=2)
+        report = {'endpoints': benchmark.run_benchmark(data, iterations=3)}
+        self.assertEqual(set(report['endpoints']), set(benchmark.ENDPOINTS))
+        for metrics in report['endpoints'].values():
+            with self.subTest():
+                self.assertLess(metrics['status'], 400)
+                self.assertLessEqual(metrics['p50_ms'], metrics['p99_ms'])
+
+        self.assertEqual(benchmark.compare(report, report), [])
+        baseline = {'endpoints': {
+            'order_detail': dict(
+                report['endpoints']['order_detail'], queries=0),
+        }}
+        self.assertIn(
+            'queries',
+            [metric for _, metric, _, _ in benchmark.compare(
+                report, baseline)])
+
+    def test_iterations_required(self):
+        with mock.patch.object(connection.creation, 'create_test_db') as db, \
+                self.assertRaises(CommandError):
+            call_command('benchmark_endpoints', iterations=0)
+        db.assert_not_called()
+
+
+class OrderSearchViewTest(BaseSetUp):
+    def test_search(self):
+        parameter = Parameter.objects.create(title='Телефон')
+        ParameterInOrder.objects.create(
+            order=self.order, parameter=parameter, value='+7 900 123-45-67')
+        Order.objects.create(service=self.service)
+
+        response = self.client.get(
+            reverse('orders:order_list'), {'q': '123-45'})
+        self.assertEqual(list(response.context['object_list']), [self.order])
+
+    def test_search_by_service(self):
+        parameter = Parameter.objects.create(title='Телефон')
+        another_service = Service.objects.create(title='Другая услуга')
+        another_order = Order.objects.create(service=another_service)
+        for order in [self.order, another_order]:
+            ParameterInOrder.objects.create(
+                order=order, parameter=parameter, value='123')
+
+        response = self.client.get(
+            reverse('orders:order_list'),
+            {'q': '123', 'service': another_service.id})
+        self.assertEqual(
+            list(response.context['object_list']), [another_order])
+        self.assertContains(
+            response,
+            f'<option value="{another_service.id}" selected>')
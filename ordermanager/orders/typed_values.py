@@ -0,0 +1,36 @@
+from django.db.models import OuterRef, Subquery
+
+from .models import ParameterInService, convert_parameter_value
+from .snapshots import SNAPSHOT_BATCH_SIZE, iter_batches
+
+TYPED_FIELDS = ['value_int', 'value_bool']
+
+
+def backfill_typed_values(model, batch_size=SNAPSHOT_BATCH_SIZE):
+    """Fill typed columns of parameter rows from their text values.
+
+    The type is the one the service of the order declares for the
+    parameter now. Values that do not match it get empty typed columns.
+    Yield the number of rows checked and of invalid values per batch.
+    """
+    queryset = model.objects.only('id', 'value', *TYPED_FIELDS).annotate(
+        type=Subquery(ParameterInService.objects.filter(
+            service=OuterRef('order__service'),
+            parameter=OuterRef('parameter'),
+        ).values('type')[:1]))
+    for batch in iter_batches(queryset, batch_size):
+        changed = []
+        invalid = 0
+        for row in batch:
+            try:
+                typed = convert_parameter_value(row.type, row.value)
+            except ValueError:
+                typed = {}
+                invalid += 1
+            values = [typed.get(field) for field in TYPED_FIELDS]
+            if values != [getattr(row, field) for field in TYPED_FIELDS]:
+                for field, value in zip(TYPED_FIELDS, values):
+                    setattr(row, field, value)
+                changed.append(row)
+        model.objects.bulk_update(changed, TYPED_FIELDS)
+        yield len(batch), invalid
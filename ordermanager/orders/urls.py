@@ -10,6 +10,8 @@ urlpatterns = [
     path('services/', views.ServiceListView.as_view(), name='service_list'),
     path('orders/<int:pk>/complete', views.OrderCompleteView.as_view(),
          name='order_complete'),
+    path('orders/export/', views.OrderExportView.as_view(),
+         name='order_export'),
     path('orders/<int:pk>/', views.OrderDetailView.as_view(),
          name='order_detail'),
     path('orders/', views.OrderListView.as_view(), name='order_list'),
@@ -0,0 +1,43 @@
+import hashlib
+
+from django.utils.http import quote_etag
+
+from .models import ArchivedOrder, Order
+
+
+def get_order_version(pk):
+    """Return when an order, archived ones included, last changed."""
+    for model in [Order, ArchivedOrder]:
+        version = model.objects.filter(pk=pk).values_list(
+            'time_updated', flat=True).first()
+        if version is not None:
+            return version
+    return None
+
+
+def get_order_etag(pk, version, *parts):
+    return quote_etag('-'.join(
+        str(part) for part in [pk, int(version.timestamp() * 10 ** 6), *parts]
+    ))
+
+
+def get_collection_etag(version, *parts):
+    """Return an ETag of an order list as of the order list version.
+
+    ``version`` is ``fragments.get_order_list_version()``, it changes
+    whenever any order is saved or deleted, so no query over the listed
+    orders is needed.
+    """
+    raw = '|'.join(str(part) for part in [version, *parts])
+    return quote_etag(hashlib.md5(raw.encode()).hexdigest())
+
+
+def get_open_orders_etag(open_orders, *parts):
+    """Return an ETag of materialized open orders, see ``open_orders``."""
+    raw = '|'.join(str(part) for part in [open_orders.version, *parts])
+    return quote_etag(hashlib.md5(raw.encode()).hexdigest())
+
+
+def get_catalog_etag(version, *parts):
+    return quote_etag('-'.join(
+        str(part) for part in ['catalog', version, *parts]))
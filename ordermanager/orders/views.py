@@ -1,24 +1,89 @@
+from django.contrib import messages
+from django.contrib.messages import get_messages
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.http import HttpResponseRedirect
+from django.db import DEFAULT_DB_ALIAS
+from django.http import (
+    Http404, HttpResponseBadRequest, HttpResponseRedirect,
+    StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404, reverse
 from django.urls import reverse_lazy
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from django.views.generic import (
-    CreateView, DetailView, ListView, RedirectView, UpdateView,
+    CreateView, DetailView, ListView, RedirectView, UpdateView, View,
 )
 
-from .forms import OrderCompleteForm, OrderCreateForm
+from .catalog import get_catalog_version, get_service_titles
+from .export import EXPORT_FORMATS, get_export_querysets, iter_export_rows
+from .feed import ORDER_FEED_PATH
+from .forms import OrderCompleteForm, OrderCreateForm, OrderExportForm
+from .fragments import FRAGMENT_CACHE_TIMEOUT, get_order_list_version
+from .intake import IntakeQueueFull, enqueue_order, is_buffered
 from .mixins import IsNotStaffPermissionMixin, IsStaffPermissionMixin
-from .models import Order, Service
+from .models import ArchivedOrder, Order, Service
+from .open_orders import get_open_orders, is_materialized
+from .search import search_orders
+from .versions import (
+    get_collection_etag, get_open_orders_etag, get_order_etag,
+    get_order_version,
+)
+
+
+def has_messages(request):
+    # Pages showing messages are not answered with 304, the messages would
+    # be left for some later page otherwise.
+    return bool(get_messages(request))
+
+
+def order_version(request, pk):
+    if has_messages(request):
+        return None
+    if not hasattr(request, 'order_version'):
+        request.order_version = get_order_version(pk)
+    return request.order_version
+
+
+def order_etag(request, pk):
+    version = order_version(request, pk)
+    if version is None:
+        return None
+    return get_order_etag(
+        pk, version, get_catalog_version(), request.user.pk)
+
+
+def open_orders(request):
+    if not hasattr(request, 'open_orders'):
+        request.open_orders = get_open_orders()
+    return request.open_orders
+
+
+def order_list_etag(request):
+    if request.GET.get('q', '').strip() or has_messages(request):
+        return None
+    if is_materialized():
+        return get_open_orders_etag(
+            open_orders(request), get_catalog_version(), request.user.pk,
+            request.GET.urlencode())
+    return get_collection_etag(
+        get_order_list_version(), get_catalog_version(), request.user.pk,
+        request.GET.urlencode())
 
 
 class ServiceListView(IsNotStaffPermissionMixin, ListView):
     """Display list of services."""
     model = Service
+    read_from_replica = True
 
 
 class OrderCreateView(IsNotStaffPermissionMixin, CreateView):
-    """Create new orders."""
+    """Create new orders.
+
+    In the buffered intake mode orders are queued and created later by
+    the ``flush_order_intake`` command.
+    """
 
+    intake_retry_after = 30
     success_url = reverse_lazy('orders:index')
     form_class = OrderCreateForm
     model = Order
@@ -33,17 +98,120 @@ class OrderCreateView(IsNotStaffPermissionMixin, CreateView):
 
     def form_valid(self, form):
         form.instance.author = self.request.user
-        return super().form_valid(form)
+        if not is_buffered():
+            return super().form_valid(form)
 
+        try:
+            intake = enqueue_order(
+                self.request.user, form.cleaned_data['service'],
+                form.parameters_in_service.items())
+        except IntakeQueueFull:
+            form.add_error(None, 'Слишком много заказов, попробуйте позже.')
+            response = self.render_to_response(
+                self.get_context_data(form=form), status=503)
+            response['Retry-After'] = self.intake_retry_after
+            return response
+        messages.success(
+            self.request, f'Заказ принят, номер заявки: {intake.id}.')
+        return HttpResponseRedirect(self.success_url)
 
+
+@method_decorator(condition(etag_func=order_list_etag), name='get')
 class OrderListView(IsStaffPermissionMixin, ListView):
-    """Display list of orders that have not been done yet."""
+    """Display list of orders that have not been done yet.
+
+    With a search query display orders, completed ones included, whose
+    parameter values contain it. With ``ORDER_LIST_MODE=materialized`` open
+    orders are taken from the cache instead of the database.
+    """
     queryset = Order.objects.filter(complete=False).select_related('service')
+    context_object_name = 'order_list'
+    template_name = 'orders/order_list.html'
+    extra_context = {
+        'feed_url': ORDER_FEED_PATH,
+        'fragment_cache_timeout': FRAGMENT_CACHE_TIMEOUT,
+    }
+    search_results_limit = 100
+    read_from_replica = True
+
+    def get_queryset(self):
+        query = self.request.GET.get('q', '').strip()
+        if not query and is_materialized():
+            return self.iter_open_orders()
+        if not query:
+            # The list is cached under the order list version, which is
+            # bumped on the primary, so it is not read from a replica.
+            return super().get_queryset().using(DEFAULT_DB_ALIAS)
+        return search_orders(
+            query, self.request.GET.get('parameter', '').strip(),
+            self.get_search_service(),
+            queryset=Order.objects.select_related('service').order_by(
+                '-time_created', '-id'),
+        )[:self.search_results_limit]
+
+    def get_search_service(self):
+        service = self.request.GET.get('service', '')
+        return int(service) if service.isdigit() else None
 
+    def iter_open_orders(self):
+        """Build the materialized open orders for the template.
 
+        Nothing is built when the list is rendered from the cache.
+        """
+        titles = get_service_titles()
+        services = {}
+        for entry in open_orders(self.request).all():
+            if entry.service_id not in titles:
+                continue
+            service = services.get(entry.service_id)
+            if service is None:
+                service = services[entry.service_id] = Service(
+                    id=entry.service_id, title=titles[entry.service_id])
+            yield Order(
+                id=entry.id, service=service, time_created=entry.time_created)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['search_query'] = self.request.GET.get('q', '').strip()
+        context['search_parameter'] = self.request.GET.get(
+            'parameter', '').strip()
+        context['search_service'] = self.get_search_service()
+        context['services'] = sorted(
+            get_service_titles().items(), key=lambda item: item[1])
+        if not context['search_query']:
+            # The list is rendered from the cache while neither orders nor
+            # service titles change, the queryset is not evaluated then.
+            # Materialized open orders have a version of their own, which
+            # changes only once their event is in the log.
+            context['order_list_version'] = (
+                open_orders(self.request).version if is_materialized()
+                else get_order_list_version())
+            context['catalog_version'] = get_catalog_version()
+        return context
+
+
+@method_decorator(
+    condition(etag_func=order_etag, last_modified_func=order_version),
+    name='get')
 class OrderDetailView(IsStaffPermissionMixin, DetailView):
-    """Display details of an order."""
-    model = Order
+    """Display details of an order, archived ones included."""
+    queryset = Order.objects.with_parameters()
+    context_object_name = 'order'
+    template_name = 'orders/order_detail.html'
+    extra_context = {'fragment_cache_timeout': FRAGMENT_CACHE_TIMEOUT}
+    read_from_replica = True
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['catalog_version'] = get_catalog_version()
+        return context
+
+    def get_object(self, queryset=None):
+        try:
+            return super().get_object(queryset)
+        except Http404:
+            return get_object_or_404(
+                ArchivedOrder.objects.with_parameters(), pk=self.kwargs['pk'])
 
 
 class OrderCompleteView(IsStaffPermissionMixin, UpdateView):
@@ -52,15 +220,35 @@ class OrderCompleteView(IsStaffPermissionMixin, UpdateView):
     model = Order
 
     def post(self, request, *args, **kwargs):
-        super().post(request, *args, **kwargs)
-
-        if self.object.complete is not True:
-            self.object.complete = True
-            self.object.performer = self.request.user
-            self.object.save()
+        pk = self.kwargs['pk']
+        if not Order.objects.mark_complete(pk, request.user):
+            order = get_object_or_404(Order, pk=pk)
+            if not order.complete:
+                messages.error(
+                    request, 'Заказ взят в работу другим сотрудником.')
 
         return HttpResponseRedirect(
-            reverse('orders:order_detail', kwargs={'pk': self.object.id}))
+            reverse('orders:order_detail', kwargs={'pk': pk}))
+
+
+class OrderExportView(IsStaffPermissionMixin, View):
+    """Stream orders with their parameters as CSV or NDJSON."""
+
+    def get(self, request, *args, **kwargs):
+        form = OrderExportForm(request.GET)
+        if not form.is_valid():
+            return HttpResponseBadRequest(form.errors.as_text())
+
+        filters = dict(form.cleaned_data)
+        export_format = filters.pop('format')
+        serialize, content_type = EXPORT_FORMATS[export_format]
+        response = StreamingHttpResponse(
+            serialize(iter_export_rows(get_export_querysets(**filters))),
+            content_type=f'{content_type}; charset=utf-8',
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="orders.{export_format}"')
+        return response
 
 
 class RouteView(LoginRequiredMixin, RedirectView):